@@ -1,10 +1,10 @@
-import json
-import os
+import word_journal
 from main import word_to_major_number
 
-def add_word_to_two_digit_cache(word):
+def add_word_to_two_digit_cache(word, cache):
     """
-    Adds a word to the two_digit_cache.json file based on its first two digits
+    Adds a word to the two_digit_cache journal based on its first two digits.
+    `cache` is the current cache (with the journal applied) and is updated in place.
     """
     # Convert word to number
     number = word_to_major_number(word)
@@ -16,14 +16,6 @@ def add_word_to_two_digit_cache(word):
     # Get first two digits
     first_two = number[:2]
     
-    # Load existing cache
-    cache_file = 'two_digit_cache.json'
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-    else:
-        cache = {}
-    
     # Initialize entry for this pair if it doesn't exist
     if first_two not in cache:
         cache[first_two] = []
@@ -35,17 +27,14 @@ def add_word_to_two_digit_cache(word):
         "number": number
     }
     
-    # Check if word already exists in cache
+    # Check if word already exists in cache; append only the new entry to the journal
     if not any(w["word"] == word for w in cache[first_two]):
         cache[first_two].append(word_data)
+        word_journal.append(first_two, [word_data])
         print(f"Added '{word}' ({number}) to cache under {first_two}")
     else:
         print(f"Word '{word}' already exists in cache")
     
-    # Save updated cache
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, ensure_ascii=False, indent=4)
-    
     return first_two
 
 # Test words that start with "qu"
@@ -65,12 +54,15 @@ qu_words = [
 print("Adding 'qu' words to cache:")
 print("=" * 30)
 
+cache = word_journal.load_cache()
 for word in qu_words:
     try:
-        first_two = add_word_to_two_digit_cache(word)
+        first_two = add_word_to_two_digit_cache(word, cache)
         print(f"  {word} -> {first_two}")
     except Exception as e:
         print(f"  Error adding {word}: {e}")
     print()
 
+# Fold the journal into two_digit_cache.json once, instead of rewriting it per word
+word_journal.compact()
 print("Done!")
\ No newline at end of file
@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache persistente das respostas da API do dicionário, partilhada por todos os workers
+# e pelos scripts offline (uma base SQLite em modo WAL)
+CACHE_DB = os.environ.get('MENMONICA_API_CACHE', 'api_cache.db')
+# Validade de cada resposta (segundos; 30 dias por omissão)
+TTL = float(os.environ.get('MENMONICA_API_CACHE_TTL', str(30 * 24 * 3600)))
+# Número máximo de respostas guardadas em disco; as menos usadas recentemente saem primeiro
+MAX_ENTRIES = int(os.environ.get('MENMONICA_API_CACHE_MAX', '50000'))
+# Respostas mantidas em memória por processo, à frente da base de dados
+MEMORY_ENTRIES = int(os.environ.get('MENMONICA_API_CACHE_MEMORY', '2048'))
+# A limpeza (expiradas + excesso) corre a cada PRUNE_EVERY escritas
+PRUNE_EVERY = 256
+
+TABLE = 'api_responses'
+
+
+def _is_busy(e):
+    message = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class ResponseCache:
+    """
+    Cache chave-valor (search_type, query) -> lista de resultados da API.
+    Lookups passam primeiro por um LRU em memória limitado a `memory_entries`;
+    em caso de falha vão à base SQLite, onde as entradas expiram após `ttl`
+    segundos e o total é limitado a `max_entries` (despejo por último acesso).
+    Erros da base de dados nunca propagam. Se a base não abrir (ou o esquema não puder
+    ser criado) a cache passa a funcionar só em memória; um erro numa leitura/escrita
+    (p.ex. "database is locked" com vários workers) só faz saltar essa operação.
+    """
+
+    def __init__(self, path=CACHE_DB, ttl=TTL, max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._disabled = False
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self):
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is None or local.pid != os.getpid():
+            conn = None
+            try:
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                    "search_type TEXT NOT NULL, query TEXT NOT NULL, payload TEXT NOT NULL, "
+                    "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                    "PRIMARY KEY (search_type, query))"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_accessed ON {TABLE}(accessed_at)")
+            except sqlite3.Error as e:
+                if conn is not None:
+                    conn.close()
+                # Base bloqueada por outro worker: tentar abrir outra vez na próxima operação
+                if not _is_busy(e):
+                    print(f"Cache da API em disco indisponível ({self.path}): {e}")
+                    self._disabled = True
+                raise
+            local.conn = conn
+            local.pid = os.getpid()
+        return conn
+
+    def _db_error(self, e):
+        # Erros pontuais (p.ex. lock ocupado além do timeout) só fazem saltar esta operação
+        if not self._disabled:
+            print(f"Cache da API em disco: operação ignorada ({self.path}): {e}")
+
+    def _remember(self, key, value, fetched_at):
+        with self._lock:
+            self._memory[key] = (value, fetched_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, query, search_type):
+        """Resultados guardados para (search_type, query), ou None se não houver/estiverem expirados."""
+        key = (search_type, query)
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                if now - item[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return item[0]
+                del self._memory[key]
+        row = None
+        if not self._disabled:
+            try:
+                conn = self._conn()
+                row = conn.execute(
+                    f"SELECT payload, fetched_at FROM {TABLE} WHERE search_type = ? AND query = ?", key
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    conn.execute(
+                        f"UPDATE {TABLE} SET accessed_at = ? WHERE search_type = ? AND query = ?", (now, *key)
+                    )
+                else:
+                    row = None
+            except sqlite3.Error as e:
+                self._db_error(e)
+                row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, query, search_type, value):
+        """Guarda os resultados em memória e em disco."""
+        key = (search_type, query)
+        now = time.time()
+        self._remember(key, value, now)
+        if self._disabled:
+            return
+        try:
+            self._conn().execute(
+                f"INSERT OR REPLACE INTO {TABLE} (search_type, query, payload, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (search_type, query, json.dumps(value, ensure_ascii=False), now, now),
+            )
+        except sqlite3.Error as e:
+            self._db_error(e)
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Remove entradas expiradas e, acima de max_entries, as de acesso mais antigo."""
+        if self._disabled:
+            return 0
+        try:
+            conn = self._conn()
+            removed = conn.execute(f"DELETE FROM {TABLE} WHERE fetched_at < ?", (time.time() - self.ttl,)).rowcount
+            excess = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    f"DELETE FROM {TABLE} WHERE rowid IN "
+                    f"(SELECT rowid FROM {TABLE} ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+            return removed
+        except sqlite3.Error as e:
+            self._db_error(e)
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if not self._disabled:
+            try:
+                self._conn().execute(f"DELETE FROM {TABLE}")
+            except sqlite3.Error as e:
+                self._db_error(e)
+
+    def stats(self):
+        with self._lock:
+            info = {'memory_entries': len(self._memory), 'hits': self.hits, 'misses': self.misses}
+        info['disk_entries'] = None
+        if not self._disabled:
+            try:
+                info['disk_entries'] = self._conn().execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+            except sqlite3.Error as e:
+                self._db_error(e)
+        return info
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """ResponseCache partilhada pelo processo (configurada pelas variáveis MENMONICA_API_CACHE*)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -1,17 +1,79 @@
-from flask import Flask, request, jsonify, render_template
-from main import find_pairs_combinations, check_pair_in_cache, find_single_digit_words, word_to_major_number, load_two_digit_cache
-from itertools import product
-import os, json, random, threading, re, unicodedata
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+from main import find_pairs_combinations, check_pair_in_cache, find_single_digit_words, word_to_major_number, get_word_index, ensure_pair_cached
+from segmentation import segment_number, MemoIndex, IncrementalSpanTable
+from combinations import product_size, combination_at, iter_combinations, sample_positions, encode_cursor, decode_cursor
+from ranking import top_k_combinations, get_frequency_table
+from result_cache import ResultCache, result_key
+import word_store
+import metrics
+import profiling
+import warmup
+import long_number
+import text_encoder
+import negative_cache
+from functools import wraps
+from itertools import islice
+import codecs, io, os, json, random, re, secrets, threading, time
 
 app = Flask(__name__, template_folder='templates')
 
+# Aquecimento no arranque (ver warmup.py). Com MENMONICA_PRELOAD o snapshot das palavras
+# é construído uma única vez no carregamento da aplicação; com `gunicorn --preload` os
+# workers herdam-no por fork (copy-on-write) e nunca leem o ficheiro. O watcher das palavras
+# só arranca nos processos da app (não nos scripts/CLI que também usam word_store).
+word_store.watch()
+warmup.start()
+
+# Métricas por pedido: latência por endpoint/modo e pedidos em curso (ver metrics.py)
+@app.before_request
+def start_request_metrics():
+    if request.path.startswith('/api/') and request.endpoint and request.endpoint != 'api_metrics':
+        g.metrics_endpoint = request.endpoint
+        g.metrics_started = time.perf_counter()
+        metrics.REQUESTS_IN_FLIGHT.inc(endpoint=request.endpoint)
+
+@app.teardown_request
+def finish_request_metrics(exc=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    metrics.REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+    metrics.REQUEST_LATENCY.observe(time.perf_counter() - g.pop('metrics_started'),
+                                    endpoint=endpoint, mode=g.pop('metrics_mode', 'other'))
+
+# Amostragem contínua de pilhas (opcional, MENMONICA_PROFILE_SAMPLING=1), uma por worker
+@app.before_request
+def start_stack_sampler():
+    profiling.ensure_sampler()
+
+def profiled(view):
+    """
+    Perfil opcional de um pedido (ver profiling.py): com o cabeçalho X-Menmonica-Profile
+    o pedido corre sob cProfile e as funções com maior tempo cumulativo vêm na
+    resposta JSON em "profile" (o perfil completo fica em MENMONICA_PROFILE_DIR).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiling.requested(request.headers.get(profiling.PROFILE_HEADER)):
+            return view(*args, **kwargs)
+        rv, report = profiling.profile_call(request.endpoint, view, *args, **kwargs)
+        response = app.make_response(rv)
+        response.headers['X-Menmonica-Profile-Status'] = 'ok' if report else 'busy'
+        data = response.get_json(silent=True) if report else None
+        if isinstance(data, dict):
+            data['profile'] = report
+            response.set_data(app.json.dumps(data))
+        return response
+    return wrapper
+
 # CORS for API when served from a different origin (e.g., GitHub Pages frontend)
 @app.after_request
 def add_cors_headers(response):
     try:
         if request.path.startswith('/api/'):
             response.headers['Access-Control-Allow-Origin'] = '*'
-            response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, If-None-Match, X-Menmonica-Profile'
+            response.headers['Access-Control-Expose-Headers'] = 'ETag'
             response.headers['Access-Control-Allow-Methods'] = 'GET,POST,OPTIONS'
     except Exception:
         pass
@@ -22,36 +84,38 @@ def add_cors_headers(response):
 def options_convert():
     return ('', 204)
 
+@app.route('/api/convert/batch', methods=['OPTIONS'])
+def options_convert_batch():
+    return ('', 204)
+
+@app.route('/api/live', methods=['OPTIONS'])
+def options_live():
+    return ('', 204)
+
+@app.route('/api/convert/document', methods=['OPTIONS'])
+def options_convert_document():
+    return ('', 204)
+
+@app.route('/api/long', methods=['OPTIONS'])
+def options_long():
+    return ('', 204)
+
 @app.route('/api/random_phrase', methods=['OPTIONS'])
 def options_random_phrase():
     return ('', 204)
 
-# Simple health endpoint for Render health checks
-# Additionally, it triggers a non-blocking cache warm-up to reduce cold-start latency
+# Liveness: the process is up and serving (no side effects)
 @app.get('/api/health')
 def health():
-    try:
-        if not app.config.get('WARMING', False):
-            app.config['WARMING'] = True
-            def warm():
-                try:
-                    # Warm two_digit_cache.json (heavy) and digit_cache.json (light) if present
-                    try:
-                        load_two_digit_cache()
-                    except Exception:
-                        pass
-                    try:
-                        with open('digit_cache.json', 'r', encoding='utf-8') as f:
-                            json.load(f)
-                    except Exception:
-                        pass
-                finally:
-                    app.config['WARMING'] = False
-            threading.Thread(target=warm, daemon=True).start()
-    except Exception:
-        app.config['WARMING'] = False
     return jsonify({'status': 'ok'})
 
+# Readiness for Render health checks: 503 until this worker has finished warming up
+@app.get('/api/ready')
+def ready():
+    warmup.start()  # a forked worker restarts a warm-up it inherited unfinished
+    is_ready, details = warmup.status()
+    return jsonify(details), (200 if is_ready else 503)
+
 @app.get('/')
 def index():
     return render_template('index.html')
@@ -64,45 +128,198 @@ def learn():
 def practice():
     return render_template('practice.html')
 
-# Helpers for words/phrases → digits mode
-def strip_diacritics(s: str) -> str:
+# Segmentação ótima (programação dinâmica) de um bloco sem correspondência exata
+def single_digit_words(digit: str):
     try:
-        nfkd = unicodedata.normalize('NFD', s)
-        return ''.join(ch for ch in nfkd if not unicodedata.combining(ch))
+        return [w for (w, _) in find_single_digit_words(digit)]
     except Exception:
-        return s
+        return []
 
-def tokenize_phrase(text: str):
+class ConvertContext:
     """
-    Tokenize a phrase into word tokens:
-    - Treat hyphens as separators
-    - Split on whitespace
-    - Remove punctuation and digits (keep letters incl. diacritics pre-normalization)
-    - Strip diacritics and lowercase for normalized form
-    Returns list of (original, normalized) tuples.
+    Estado partilhado por uma conversão ou por um lote de conversões: o índice do
+    snapshot atual envolvido em MemoIndex (sub-sequências comuns são procuradas uma vez)
+    e os resultados já calculados por bloco/número. Se o snapshot mudar (p.ex. um par
+    novo foi buscado à API) a memória é descartada.
     """
-    if not isinstance(text, str):
-        return []
-    raw = text.strip()
-    # Treat hyphens as separators
-    raw = raw.replace('-', ' ')
-    # Split on whitespace
-    parts = [p for p in re.split(r'\s+', raw) if p]
-    tokens = []
-    for p in parts:
-        original = p
-        # Keep letters only (Unicode Latin ranges)
-        cleaned = re.sub(r'[^A-Za-zÀ-ÖØ-öø-ÿ]', '', p, flags=re.UNICODE).strip()
-        if not cleaned:
+
+    def __init__(self):
+        self._index = None
+        self._memo_index = None
+        self.results = {}
+        self.mode = None
+
+    def index(self):
+        with metrics.stage('snapshot'):
+            current = get_word_index()
+        if current is not self._index:
+            self._index = current
+            self._memo_index = MemoIndex(current)
+            self.results = {}
+        return self._memo_index
+
+    def memo(self, key, compute):
+        if key not in self.results:
+            self.results[key] = compute()
+        return self.results[key]
+
+def segment_partitions(number: str, ctx=None):
+    # Pares ainda sem cache são procurados uma única vez antes de montar a tabela; o índice
+    # só é lido depois, para incluir os pares que acabaram de ser publicados
+    ensure_pairs_cached([number])
+    index = ctx.index() if ctx is not None else get_word_index()
+    with metrics.stage('segmentation'):
+        if len(number) > long_number.CHUNK_DIGITS:
+            # Números muito longos: tabela construída por blocos em paralelo (mesmo resultado)
+            digit_words = {d: single_digit_words(d) for d in set(number)}
+            return [{'sequence': p['sequence'], 'words': p['words']}
+                    for p in long_number.iter_partitions(number, index, digit_words)]
+        return segment_number(number, index, single_digit_words)
+
+def ensure_pairs_cached(numbers):
+    pairs = set()
+    for number in numbers:
+        pairs.update(number[i:i + 2] for i in range(len(number) - 1))
+    for pair in sorted(pairs):
+        try:
+            ensure_pair_cached(pair)
+        except Exception:
             continue
-        normalized = strip_diacritics(cleaned).lower()
-        tokens.append((original, normalized))
-    return tokens
-@app.post('/api/convert')
-def api_convert():
-    data = request.get_json(silent=True) or {}
-    number = str(data.get('number', '')).strip()
-    blocks = data.get('blocks')
+
+# Limites da paginação: combinações por página e, com rank, a última posição servida
+# (a procura por pontuação calcula todas as combinações até ao fim da página pedida)
+MAX_COMBOS = int(os.environ.get('MENMONICA_MAX_COMBOS', '1000'))
+RANK_MAX_POSITION = int(os.environ.get('MENMONICA_RANK_MAX', '10000'))
+
+def normalize_max_combos(value):
+    """maxCombos como inteiro: 50 se faltar ou for inválido, no máximo MAX_COMBOS."""
+    try:
+        max_combos = int(value)
+    except (ValueError, TypeError):
+        max_combos = 50
+    return min(max_combos, MAX_COMBOS)
+
+def combos_preview(partitions, max_combos, start=0, sample=False, rng=None, rank=False):
+    """
+    Página de combinações a partir da posição `start` da ordem de itertools.product
+    (ou, com `rank`, da ordem por pontuação, só até RANK_MAX_POSITION; com `sample`,
+    uma amostra aleatória uniforme sem repetições).
+    Devolve (combinações, total de combinações, posição seguinte ou None).
+    """
+    # Gerar combinações apenas se todos os blocos/partições tiverem pelo menos uma palavra
+    if not partitions or not all(p['words'] for p in partitions):
+        return [], 0, None
+    word_lists = [p['words'] for p in partitions]
+    total = product_size(word_lists)
+    count = max(1, max_combos)
+    if sample:
+        combos = [' '.join(c) for c in (combination_at(word_lists, pos) for pos in sample_positions(total, count, rng))]
+        return combos, total, None
+    end = total
+    if rank:
+        end = min(total, RANK_MAX_POSITION)
+        ranked = top_k_combinations(word_lists, min(start + count, end))[start:]
+        combos = [' '.join(words) for _, words in ranked]
+    else:
+        combos = [' '.join(c) for c in islice(iter_combinations(word_lists, start), count)]
+    next_position = start + len(combos)
+    return combos, total, (next_position if next_position < end else None)
+
+def convert_text(text: str):
+    with metrics.stage('tokenize'):
+        try:
+            items = text_encoder.encode_text(text)
+        except Exception:
+            items = []
+    full_number = ''.join(it['number'] for it in items)
+    return {
+        'mode': 'words',
+        'input': text,
+        'tokens': items,
+        'tokenCount': len(items),
+        'fullNumber': full_number,
+        'digitCount': len(full_number),
+    }
+
+# Função auxiliar para obter palavras para um bloco específico
+def words_for_block(block: str, ctx: ConvertContext):
+    block = block.strip()
+    words: list[str] = []
+    if not block:
+        return words
+    if len(block) == 1:
+        # Dígito único: usar cache/rotina existente
+        try:
+            words = [w for (w, _) in find_single_digit_words(block)]
+        except Exception:
+            words = []
+    else:
+        first_two = block[:2]
+        try:
+            # 1) Tentar via índice por número completo (igualdade exata)
+            index = ctx.index()
+            with metrics.stage('exact_lookup'):
+                words = list(index.exact(block))
+            # 2) Fallback: par ainda sem cache -> usar algoritmo existente (pode buscar na API),
+            #    exceto se o bloco já foi confirmado sem palavras neste snapshot
+            empty_key = ('block', word_store.get_snapshot().tag, block)
+            if not words and not check_pair_in_cache(first_two) and not negative_cache.known_empty(empty_key):
+                with metrics.stage('greedy'):
+                    sugg = find_pairs_combinations(block, verbose=False) or {}
+                collected = set()
+                for _, pairs in sugg.items():
+                    for w, _src in pairs:
+                        try:
+                            if isinstance(w, str) and word_to_major_number(w) == block:
+                                collected.add(w)
+                        except Exception:
+                            continue
+                words = list(collected)
+                if not words:
+                    negative_cache.remember_empty(empty_key)
+        except Exception:
+            # Em qualquer erro, garantir retorno seguro
+            words = []
+    # Normalizar e ordenar
+    words = sorted({w for w in words if isinstance(w, str) and w}, key=lambda w: w.lower())
+    return words
+
+def block_partitions(block: str, ctx: ConvertContext):
+    words_only = words_for_block(block, ctx)
+    if words_only:
+        return [{'sequence': block, 'words': words_only}]
+    # Divisão do bloco em sub-blocos exatos com o menor número de partes
+    return segment_partitions(block, ctx)
+
+def number_partitions(number: str, ctx: ConvertContext):
+    with metrics.stage('greedy'):
+        suggestions = find_pairs_combinations(number, verbose=False) or {}
+
+    partitions = []
+    total_results = 0
+    for seq, words in suggestions.items():
+        # filtrar por correspondência exata ao bloco/segmento
+        words_only = sorted(
+            { w[0] for w in words if isinstance(w, (list, tuple)) and len(w) > 0 and word_to_major_number(w[0]) == seq },
+            key=lambda w: w.lower()
+        )
+        total_results += len(words_only)
+        partitions.append({'sequence': seq, 'words': words_only})
+
+    # Fallback: se nada foi encontrado para a sequência inteira,
+    # dividir a sequência em sub-blocos exatos (menor número de partes)
+    if total_results == 0 and number:
+        partitions = segment_partitions(number, ctx)
+    return partitions
+
+def normalize_convert_request(data):
+    """
+    Forma canónica de um pedido de /api/convert: o que determina a resposta, já
+    normalizado (texto com letras, blocos em lista, maxCombos inteiro, opções de
+    paginação). Serve a convert_request e à chave da cache de resultados.
+    """
+    if not isinstance(data, dict):
+        data = {}
     # Words/Phrases → Digits (auto-detect by presence of letters in 'text')
     text = str((data.get('text') or '')).strip()
     if text:
@@ -111,39 +328,10 @@ def api_convert():
         except Exception:
             has_letters = False
         if has_letters:
-            try:
-                token_pairs = tokenize_phrase(text)
-            except Exception:
-                token_pairs = []
-            items = []
-            for orig, norm in token_pairs:
-                try:
-                    num = word_to_major_number(norm)
-                except Exception:
-                    num = ""
-                items.append({'original': orig, 'normalized': norm, 'number': str(num or "")})
-            full_number = ''.join(it['number'] for it in items)
-            return jsonify({
-                'mode': 'words',
-                'input': text,
-                'tokens': items,
-                'tokenCount': len(items),
-                'fullNumber': full_number,
-                'digitCount': len(full_number),
-            })
-
-    # Cache em memória por requisição para evitar leituras repetidas do disco
-    two_digit_cache = None
-    def get_two_digit_cache():
-        nonlocal two_digit_cache
-        if two_digit_cache is None:
-            try:
-                with open('two_digit_cache.json', 'r', encoding='utf-8') as f:
-                    two_digit_cache = json.load(f)
-            except Exception:
-                two_digit_cache = {}
-        return two_digit_cache
+            return {'text': text}
 
+    number = str(data.get('number', '')).strip()
+    blocks = data.get('blocks')
     # Normalizar blocks se vierem como string
     if isinstance(blocks, str):
         blocks = [b for b in blocks.split() if b]
@@ -151,225 +339,427 @@ def api_convert():
     if not blocks and (' ' in number):
         blocks = [b for b in number.split() if b]
 
-    max_combos = data.get('maxCombos', 50)
-    try:
-        max_combos = int(max_combos)
-    except (ValueError, TypeError):
-        max_combos = 50
+    max_combos = normalize_max_combos(data.get('maxCombos', 50))
+
+    return {
+        'number': number,
+        'blocks': blocks or None,
+        'maxCombos': max_combos,
+        'rank': str(data.get('rank', '')).lower() in ('1', 'true', 'yes', 'on'),
+        'random': str(data.get('random', '')).lower() in ('1', 'true', 'yes', 'on'),
+        'seed': data.get('seed'),
+        'cursor': data.get('cursor') or None,
+        'offset': data.get('offset'),
+    }
+
+def convert_request(data, ctx=None):
+    """
+    Conversão de um pedido no formato de /api/convert. Devolve (corpo, estado HTTP).
+    `ctx` permite partilhar snapshot e resultados entre vários pedidos (lotes).
+    """
+    ctx = ctx or ConvertContext()
+    req = normalize_convert_request(data)
+    if 'text' in req:
+        ctx.mode = 'words'
+        return convert_text(req['text']), 200
+
+    number = req['number']
+    blocks = req['blocks']
+    max_combos = req['maxCombos']
 
     # Se nada foi enviado
     if not number and not blocks:
-        return jsonify({
+        return {
             'input': '',
             'partitions': [],
             'totalResults': 0,
             'combosPreview': [],
-            'combosPreviewCount': 0
-        })
-
-    # Validação de dígitos
-    def only_digits(s: str) -> bool:
-        return s.isdigit()
+            'combosPreviewCount': 0,
+            'combosTotal': 0,
+            'nextCursor': None,
+        }, 200
 
+    ctx.mode = 'blocks' if blocks else 'digits'
     if blocks:
         # Validação dos blocos
-        if not all(isinstance(b, str) and only_digits(b) for b in blocks):
-            return jsonify({'error': 'Blocos inválidos. Use apenas dígitos e espaços.'}), 400
-
-        # Função auxiliar para obter palavras para um bloco específico
-        def words_for_block(block: str):
-            block = block.strip()
-            words: list[str] = []
-            if not block:
-                return words
-            if len(block) == 1:
-                # Dígito único: usar cache/rotina existente
-                try:
-                    words = [w for (w, _) in find_single_digit_words(block)]
-                except Exception:
-                    words = []
-            else:
-                first_two = block[:2]
-                try:
-                    # 1) Tentar via cache de dois dígitos
-                    cache = get_two_digit_cache()
-                    if first_two in cache:
-                        # Aceitar correspondências que começam com o bloco (mais abrangente)
-                        words = [
-                            wd.get('word')
-                            for wd in cache.get(first_two, [])
-                            if isinstance(wd, dict) and isinstance(wd.get('word'), str)
-                            and isinstance(wd.get('number'), str) and wd.get('number') == block
-                        ]
-                    # 2) Fallback: usar algoritmo existente e filtrar pelo bloco (igualdade exata)
-                    if not words:
-                        sugg = find_pairs_combinations(block, verbose=False) or {}
-                        collected = set()
-                        for _, pairs in sugg.items():
-                            for w, _src in pairs:
-                                try:
-                                    if isinstance(w, str) and word_to_major_number(w) == block:
-                                        collected.add(w)
-                                except Exception:
-                                    continue
-                        words = list(collected)
-                except Exception:
-                    # Em qualquer erro, garantir retorno seguro
-                    words = []
-            # Normalizar e ordenar
-            words = sorted({w for w in words if isinstance(w, str) and w}, key=lambda w: w.lower())
-            return words
+        if not all(isinstance(b, str) and b.isdigit() for b in blocks):
+            return {'error': 'Blocos inválidos. Use apenas dígitos e espaços.'}, 400
 
         partitions = []
-        total_results = 0
         for b in blocks:
-            words_only = words_for_block(b)
-            if words_only:
-                total_results += len(words_only)
-                partitions.append({'sequence': b, 'words': words_only})
-            else:
-                # Divisão gulosa esquerda->direita do bloco em sub-blocos exatos
-                i = 0
-                n = len(b)
-                while i < n:
-                    best_seq = None
-                    best_words = []
-                    for j in range(n, i, -1):
-                        seg = b[i:j]
-                        ws = words_for_block(seg)
-                        if ws:
-                            best_seq = seg
-                            best_words = ws
-                            break
-                    if best_seq:
-                        partitions.append({'sequence': best_seq, 'words': best_words})
-                        total_results += len(best_words)
-                        i += len(best_seq)
-                    else:
-                        # tentar dígito único para progredir
-                        d = b[i]
-                        ws = words_for_block(d)
-                        if ws:
-                            partitions.append({'sequence': d, 'words': ws})
-                            total_results += len(ws)
-                        i += 1
-        
-        # Gerar combinações apenas se todos os blocos/partições tiverem pelo menos uma palavra
-        combos = []
-        if partitions and all(p['words'] for p in partitions):
-            for combo in product(*[p['words'] for p in partitions]):
-                combos.append(' '.join(combo))
-                if len(combos) >= max_combos:
-                    break
-        
-        return jsonify({
-            'input': ' '.join(blocks),
-            'partitions': partitions,
-            'totalResults': total_results,
-            'combosPreview': combos,
-            'combosPreviewCount': len(combos),
-        })
-
-    # Fluxo antigo (sem blocks): usar partições automáticas
-    if not only_digits(number):
-        return jsonify({'error': 'Número inválido. Use apenas dígitos.'}), 400
+            partitions.extend(ctx.memo(('block', b), lambda: block_partitions(b, ctx)))
+        input_value = ' '.join(blocks)
+    else:
+        # Fluxo antigo (sem blocks): usar partições automáticas
+        if not number.isdigit():
+            return {'error': 'Número inválido. Use apenas dígitos.'}, 400
+        partitions = ctx.memo(('number', number), lambda: number_partitions(number, ctx))
+        input_value = number
 
-    suggestions = find_pairs_combinations(number, verbose=False) or {}
+    # Paginação das combinações: cursor devolvido antes, offset explícito ou amostra aleatória;
+    # com "rank" as combinações vêm por pontuação (ver ranking.py)
+    word_lists = [p['words'] for p in partitions]
+    rank = req['rank']
+    ordering = 'rank' if rank else 'product'
+    start = 0
+    if req['cursor']:
+        try:
+            start = decode_cursor(word_lists, str(req['cursor']), ordering)
+        except ValueError:
+            return {'error': 'Cursor inválido para este número.'}, 400
+    elif req['offset'] is not None:
+        try:
+            start = max(0, int(req['offset']))
+        except (ValueError, TypeError):
+            return {'error': 'Offset inválido.'}, 400
+    if rank and not req['random'] and start >= RANK_MAX_POSITION:
+        return {'error': f'Com rank só as primeiras {RANK_MAX_POSITION} combinações podem ser paginadas.'}, 400
+    sample = req['random']
+    seed = req['seed']
+    if sample and seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, str))):
+        return {'error': 'Seed inválida. Use um número inteiro ou texto.'}, 400
+    rng = random.Random(seed) if sample and seed is not None else None
 
-    partitions = []
-    total_results = 0
-    for seq, words in suggestions.items():
-        # filtrar por correspondência exata ao bloco/segmento
-        words_only = sorted(
-            { w[0] for w in words if isinstance(w, (list, tuple)) and len(w) > 0 and word_to_major_number(w[0]) == seq },
-            key=lambda w: w.lower()
-        )
-        total_results += len(words_only)
-        partitions.append({'sequence': seq, 'words': words_only})
+    with metrics.stage('combinations'):
+        combos, combos_total, next_position = combos_preview(partitions, max_combos, start, sample, rng, rank)
+    return {
+        'input': input_value,
+        'partitions': partitions,
+        'totalResults': sum(len(p['words']) for p in partitions),
+        'combosPreview': combos,
+        'combosPreviewCount': len(combos),
+        'combosTotal': combos_total,
+        'nextCursor': encode_cursor(word_lists, next_position, ordering) if next_position is not None else None,
+    }, 200
 
-    # Fallback: se nada foi encontrado para a sequência inteira,
-    # dividir a sequência em sub-blocos exatos (guloso esquerda->direita)
-    if total_results == 0 and number:
-        def exact_words(block: str):
-            block = block.strip()
-            if not block:
-                return []
-            # Dígito único
-            if len(block) == 1:
-                try:
-                    return sorted({w for (w, _) in find_single_digit_words(block)}, key=lambda w: w.lower())
-                except Exception:
-                    return []
-            # Dois+ dígitos
-            words = []
-            first_two = block[:2]
-            try:
-                cache = get_two_digit_cache()
-                if first_two in cache:
-                    words = [
-                        wd.get('word')
-                        for wd in cache.get(first_two, [])
-                        if isinstance(wd, dict) and isinstance(wd.get('word'), str)
-                        and isinstance(wd.get('number'), str) and wd.get('number') == block
-                    ]
-                if not words:
-                    sugg_local = find_pairs_combinations(block, verbose=False) or {}
-                    collected = set()
-                    for _, pairs in sugg_local.items():
-                        for w, _src in pairs:
-                            try:
-                                if isinstance(w, str) and word_to_major_number(w) == block:
-                                    collected.add(w)
-                            except Exception:
-                                continue
-                    words = list(collected)
-            except Exception:
-                words = []
-            return sorted({w for w in words if isinstance(w, str) and w}, key=lambda w: w.lower())
-
-        n = len(number)
-        i = 0
-        greedy_partitions = []
-        while i < n:
-            best_seq = None
-            best_words = []
-            for j in range(n, i, -1):
-                seg = number[i:j]
-                ws = exact_words(seg)
-                if ws:
-                    best_seq = seg
-                    best_words = ws
-                    break
-            if best_seq:
-                greedy_partitions.append({'sequence': best_seq, 'words': best_words})
-                i += len(best_seq)
-            else:
-                # fallback para dígito único (para progredir e ainda tentar dar sugestões)
-                d = number[i]
-                ws = exact_words(d)
-                if ws:
-                    greedy_partitions.append({'sequence': d, 'words': ws})
-                i += 1
-
-        partitions = greedy_partitions
-        total_results = sum(len(p['words']) for p in partitions)
-    
-    combos = []
-    if partitions and all(p['words'] for p in partitions):
-        for combo in product(*[p['words'] for p in partitions]):
-            combos.append(' '.join(combo))
-            if len(combos) >= max_combos:
-                break
-    
+# Cache de respostas por pedido normalizado + versão dos dados (ver result_cache.py)
+RESULT_CACHE = ResultCache()
+
+def convert_data_tag(req):
+    """
+    Versão de tudo o que determina a resposta: snapshot das palavras (pares e
+    digit_cache.json, ver WordSnapshot.tag) e frequências, com rank.
+    """
+    tag = word_store.get_snapshot().tag
+    if req.get('rank'):
+        tag = f'{tag}/{get_frequency_table().version}'
+    return tag
+
+@app.post('/api/convert')
+@profiled
+def api_convert():
+    data = request.get_json(silent=True) or {}
+    req = normalize_convert_request(data)
+    # Amostras aleatórias sem seed não são reprodutíveis: sem ETag nem cache
+    deterministic = not (req.get('random') and req.get('seed') is None)
+    if deterministic:
+        etag = result_key(req, convert_data_tag(req))
+        if etag in request.if_none_match:
+            g.metrics_mode = 'not_modified'
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        cached = RESULT_CACHE.get(etag) if RESULT_CACHE.enabled else None
+        if RESULT_CACHE.enabled:
+            metrics.cache_lookup('result_cache', cached is not None)
+        if cached is not None:
+            payload, status, g.metrics_mode = cached
+            response = Response(payload, status=status, mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+    ctx = ConvertContext()
+    body, status = convert_request(data, ctx)
+    g.metrics_mode = ctx.mode or 'empty'
+    response = jsonify(body)
+    response.status_code = status
+    if deterministic and status == 200:
+        # A conversão pode ter acrescentado um par (API): a chave usa os dados de agora
+        etag = result_key(req, convert_data_tag(req))
+        RESULT_CACHE.put(etag, (response.get_data(), status, g.metrics_mode))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Conversão em lote: muitos números/textos num só pedido, sobre o mesmo snapshot
+BATCH_MAX_ITEMS = int(os.environ.get('MENMONICA_BATCH_MAX', '1000'))
+
+def batch_items(data):
+    """
+    Normaliza os itens de um lote: cada item é um objeto no formato de /api/convert
+    ou uma string (texto se tiver letras, senão número/blocos). `maxCombos` global
+    aplica-se aos itens que não definem o seu.
+    """
+    items = data.get('items')
+    if items is None:
+        items = list(data.get('numbers') or []) + list(data.get('texts') or [])
+    if not isinstance(items, list):
+        return None
+    default_combos = data.get('maxCombos')
+    normalized = []
+    for item in items:
+        if isinstance(item, (int, str)) and not isinstance(item, bool):
+            item = str(item)
+            item = {'text': item} if any(ch.isalpha() for ch in item) else {'number': item}
+        elif not isinstance(item, dict):
+            item = {}
+        if default_combos is not None and 'maxCombos' not in item:
+            item = dict(item, maxCombos=default_combos)
+        normalized.append(item)
+    return normalized
+
+def batch_digits(items):
+    """Sequências de dígitos do lote, para procurar de uma vez os pares em falta."""
+    numbers = []
+    for item in items:
+        if str(item.get('text') or '').strip():
+            continue
+        blocks = item.get('blocks')
+        if isinstance(blocks, str):
+            blocks = blocks.split()
+        if isinstance(blocks, list):
+            numbers.extend(b for b in blocks if isinstance(b, str) and b.isdigit())
+        numbers.extend(b for b in str(item.get('number', '')).split() if b.isdigit())
+    return numbers
+
+def wants_stream():
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return 'application/x-ndjson' in (request.headers.get('Accept') or '')
+
+@app.post('/api/convert/batch')
+def api_convert_batch():
+    """
+    Converte uma lista de números e/ou textos: {"items": [...], "maxCombos": N}
+    (ou "numbers"/"texts"). Todos os itens partilham o mesmo snapshot e os resultados
+    de blocos/sub-sequências repetidos. Com ?stream=1 (ou Accept: application/x-ndjson)
+    a resposta é NDJSON, uma linha {"index", "status", "result"} por item, pela ordem.
+    """
+    data = request.get_json(silent=True) or {}
+    items = batch_items(data) if isinstance(data, dict) else None
+    if items is None:
+        return jsonify({'error': 'Lote inválido. Envie "items" como lista.'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Lote demasiado grande (máximo {BATCH_MAX_ITEMS} itens).'}), 400
+
+    ctx = ConvertContext()
+    if wants_stream():
+        g.metrics_mode = 'stream'
+        def generate():
+            for i, item in enumerate(items):
+                body, status = convert_request(item, ctx)
+                yield json.dumps({'index': i, 'status': status, 'result': body}, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    g.metrics_mode = 'batch'
+    # Pares em falta são procurados antes, para que todo o lote veja o mesmo snapshot
+    ensure_pairs_cached(batch_digits(items))
+    results = []
+    for item in items:
+        body, status = convert_request(item, ctx)
+        results.append({'status': status, 'result': body})
+    return jsonify({'results': results, 'count': len(results)})
+
+# Tamanho máximo (bytes) de um documento em /api/convert/document
+DOCUMENT_MAX_BYTES = int(os.environ.get('MENMONICA_DOCUMENT_MAX', str(64 * 1024 * 1024)))
+
+@app.post('/api/convert/document')
+def api_convert_document():
+    """
+    Palavras → dígitos para documentos inteiros: um ficheiro enviado em multipart
+    (campo "file") ou o próprio corpo do pedido (text/plain), lidos aos blocos.
+    A resposta é sempre NDJSON: uma linha por linha do documento com palavras
+    {"line", "fullNumber", "digitCount", "tokenCount"}, e no fim {"done": true, ...}.
+    Parâmetros: unit=line|paragraph, tokens=1 (inclui os tokens de cada linha),
+    encoding (por omissão utf-8).
+    """
+    upload = request.files.get('file')
+    stream = request.stream
+    if upload is not None:
+        # O ficheiro é fechado quando o pedido termina, antes do fim da resposta em stream:
+        # ficamos com ele e fechamo-lo no fim do gerador
+        stream, upload.stream = upload.stream, io.BytesIO()
+    unit = 'paragraph' if request.args.get('unit') == 'paragraph' else 'line'
+    with_tokens = request.args.get('tokens', '').lower() in ('1', 'true', 'yes', 'on')
+    encoding = request.args.get('encoding') or 'utf-8'
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return jsonify({'error': 'Codificação desconhecida.'}), 400
+    g.metrics_mode = 'document'
+
+    def generate():
+        units = tokens = digits = 0
+        lines = []
+        size = 0
+        chunks = text_encoder.read_chunks(stream, DOCUMENT_MAX_BYTES)
+        try:
+            for item in text_encoder.encode_document(chunks, unit, with_tokens, encoding):
+                units += 1
+                tokens += item['tokenCount']
+                digits += item['digitCount']
+                line = json.dumps(item, ensure_ascii=False) + '\n'
+                lines.append(line)
+                size += len(line)
+                # Enviar aos ~64 KB em vez de uma escrita por linha
+                if size >= 65536:
+                    yield ''.join(lines)
+                    lines, size = [], 0
+        except text_encoder.DocumentTooLarge as e:
+            lines.append(json.dumps({'error': str(e)}, ensure_ascii=False) + '\n')
+            yield ''.join(lines)
+            return
+        finally:
+            if upload is not None:
+                stream.close()
+        lines.append(json.dumps({'done': True, 'units': units, 'tokenCount': tokens, 'digitCount': digits}) + '\n')
+        yield ''.join(lines)
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Tamanho máximo (dígitos) aceite por /api/long
+LONG_MAX_DIGITS = int(os.environ.get('MENMONICA_LONG_MAX', '1000000'))
+
+@app.post('/api/long')
+def api_long():
+    """
+    Números muito longos (milhares de dígitos de constantes, extratos): {"number": "..."}
+    (tudo o que não for dígito é ignorado). Devolve a divisão com menos partes, como
+    /api/convert, sem combinações; cada parte traz "start" (posição no número).
+    Com ?stream=1 (ou Accept: application/x-ndjson) as partes saem em NDJSON, pela
+    ordem, seguidas de uma linha {"done": true, ...} com os totais.
+    """
+    data = request.get_json(silent=True) or {}
+    number = long_number.clean_digits(str(data.get('number') or ''))
+    if not number:
+        return jsonify({'error': 'Número inválido. Envie "number" com dígitos.'}), 400
+    if len(number) > LONG_MAX_DIGITS:
+        return jsonify({'error': f'Número demasiado longo (máximo {LONG_MAX_DIGITS} dígitos).'}), 400
+
+    ensure_pairs_cached([number])
+    index = get_word_index()
+    digit_words = {d: single_digit_words(d) for d in set(number)}
+    if wants_stream():
+        g.metrics_mode = 'stream'
+        def generate():
+            parts = covered = 0
+            for part in long_number.iter_partitions(number, index, digit_words):
+                parts += 1
+                covered += len(part['sequence'])
+                yield json.dumps(part, ensure_ascii=False) + '\n'
+            yield json.dumps({'done': True, 'digits': len(number), 'parts': parts,
+                              'uncovered': len(number) - covered}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    g.metrics_mode = 'long'
+    with metrics.stage('segmentation'):
+        partitions = list(long_number.iter_partitions(number, index, digit_words))
+    return jsonify({
+        'digits': len(number),
+        'partitions': partitions,
+        'count': len(partitions),
+        'uncovered': len(number) - sum(len(p['sequence']) for p in partitions),
+    })
+
+# Valores que já existem noutro sítio são lidos só quando as métricas são pedidas
+@metrics.REGISTRY.add_collector
+def collect_cache_metrics():
+    for name, fn in (('word_to_major_number', word_to_major_number), ('find_single_digit_words', find_single_digit_words)):
+        info = fn.cache_info()
+        metrics.CACHE_LOOKUPS.set(info.hits, cache=f'{name}_lru', result='hit')
+        metrics.CACHE_LOOKUPS.set(info.misses, cache=f'{name}_lru', result='miss')
+    snapshot = word_store.get_snapshot()
+    index = snapshot.index
+    buckets = metrics.Histogram('menmonica_pair_bucket_words', 'Palavras por par (00-99) no snapshot atual.',
+                                buckets=metrics.SIZE_BUCKETS)
+    for i in range(100):
+        buckets.observe(index.pair_size(f'{i:02d}'))
+    words = metrics.Gauge('menmonica_snapshot_words', 'Palavras e pares no snapshot atual.', ('kind',))
+    words.set(index.word_count, kind='words')
+    words.set(index.pair_count, kind='pairs')
+    return [buckets, words]
+
+# Sessões de escrita ao vivo: uma tabela de segmentos incremental por sessão, por worker
+LIVE_SESSIONS = ResultCache(int(os.environ.get('MENMONICA_LIVE_SESSIONS', '256')),
+                            float(os.environ.get('MENMONICA_LIVE_TTL', '900')))
+
+def live_digits(value):
+    digits = re.sub(r'\s', '', str(value))
+    return digits if digits.isdigit() or not digits else None
+
+@app.post('/api/live')
+@profiled
+def api_live():
+    """
+    Sugestões enquanto se escreve um número, sem recalcular tudo a cada tecla.
+    Corpo JSON:
+      - session: id devolvido pela resposta anterior (omitir para começar)
+      - backspace: quantos dígitos apagar no fim; append: dígitos a acrescentar
+      - number: (opcional) o número completo do cliente; aplicado por último, ressincroniza
+        a sessão. Uma sessão que expirou ou é de outro worker sem "number" dá 409: o cliente
+        tem de reenviar o número completo
+      - maxCombos: como em /api/convert
+    O resultado é o de /api/convert com um único bloco (palavras do número inteiro ou
+    a divisão com menos partes), mas só os segmentos que terminam nos dígitos novos
+    são procurados no índice. A resposta tem o formato de /api/convert mais "session".
+    """
+    data = request.get_json(silent=True) or {}
+    append = live_digits(data.get('append') or '')
+    number = live_digits(data['number']) if data.get('number') is not None else ''
+    if append is None or number is None:
+        return jsonify({'error': 'Número inválido. Use apenas dígitos.'}), 400
+    try:
+        backspace = max(0, int(data.get('backspace') or 0))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'backspace inválido.'}), 400
+    max_combos = normalize_max_combos(data.get('maxCombos', 50))
+
+    session_id = str(data.get('session') or '')
+    session = LIVE_SESSIONS.get(session_id) if session_id else None
+    if session is None and session_id and data.get('number') is None:
+        # Sem a tabela anterior, append/backspace seriam aplicados a um número vazio
+        return jsonify({'error': 'Sessão desconhecida ou expirada. Reenvie o número completo em "number".'}), 409
+    if session is None:
+        session_id = secrets.token_urlsafe(12)
+        table = IncrementalSpanTable(get_word_index, single_digit_words, lambda pair: ensure_pairs_cached([pair]))
+        session = (table, threading.Lock())
+    LIVE_SESSIONS.put(session_id, session)
+
+    table, lock = session
+    ctx = ConvertContext()
+    g.metrics_mode = 'live'
+    with lock:
+        with metrics.stage('segmentation'):
+            if backspace:
+                table.pop(backspace)
+            if append:
+                table.push(append)
+            if data.get('number') is not None:
+                table.set(number)
+        number = table.number
+        partitions = []
+        if number:
+            words = words_for_block(number, ctx)
+            partitions = [{'sequence': number, 'words': words}] if words else table.partitions()
+    with metrics.stage('combinations'):
+        combos, combos_total, _ = combos_preview(partitions, max_combos)
     return jsonify({
+        'session': session_id,
         'input': number,
         'partitions': partitions,
-        'totalResults': total_results,
+        'totalResults': sum(len(p['words']) for p in partitions),
         'combosPreview': combos,
         'combosPreviewCount': len(combos),
+        'combosTotal': combos_total,
     })
 
+@app.get('/api/metrics')
+def api_metrics():
+    """Métricas do worker no formato de texto do Prometheus."""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.get('/api/random_phrase')
+@profiled
 def api_random_phrase():
     """
     Devolve uma frase (lista de palavras) escolhida aleatoriamente a partir da base (two_digit_cache.json).
@@ -384,45 +774,16 @@ def api_random_phrase():
         words_count = 2
     words_count = max(1, min(6, words_count))
 
-    # carregar cache
-    cache_file = 'two_digit_cache.json'
-    try:
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-    except Exception:
+    # snapshot da cache (já carregado em memória)
+    snapshot = word_store.get_snapshot()
+    if not snapshot.available:
         return jsonify({'error': 'Cache indisponível para gerar frases.'}), 503
 
-    # recolher palavras únicas válidas
-    unique = {}
-    if isinstance(cache, dict):
-        for entries in cache.values():
-            if not isinstance(entries, list):
-                continue
-            for wd in entries:
-                if not isinstance(wd, dict):
-                    continue
-                w = wd.get('word')
-                num = wd.get('number')
-                if isinstance(w, str) and isinstance(num, str) and w and num:
-                    # excluir palavras compostas/traços/apóstrofos
-                    if (' ' in w) or ('-' in w) or ("'" in w):
-                        continue
-                    lw = w.strip().lower()
-                    # manter única por minúsculas
-                    if lw not in unique:
-                        unique[lw] = {'word': w, 'number': num}
-
-    pool = list(unique.values())
-    if not pool:
+    # palavras únicas válidas, tiradas ao acaso do pool do snapshot (ou dos shards)
+    phrase_words = snapshot.phrase_words(words_count)
+    if not phrase_words:
         return jsonify({'error': 'Sem palavras disponíveis na cache para gerar frases.'}), 503
 
-    # amostrar aleatoriamente
-    if len(pool) <= words_count:
-        chosen = pool
-    else:
-        chosen = random.sample(pool, words_count)
-
-    phrase_words = [it['word'] for it in chosen]
     return jsonify({'words': phrase_words})
 
 if __name__ == '__main__':
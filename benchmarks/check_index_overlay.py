@@ -0,0 +1,77 @@
+"""
+Regression check for word_store with a word_index.bin built from the JSON cache
+plus dictionary.db: saving a word (journal append), a compaction and a reload
+must never swap the mapped index for the smaller JSON-only corpus. Words that
+only exist in the DB must stay visible and the word count must only grow.
+Exits 1 on any violation.
+
+    python benchmarks/check_index_overlay.py
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic import generate_words, write_cache_json, write_dictionary_db  # noqa: E402
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="menmonica-overlay-")
+    os.chdir(workdir)
+    os.environ["MENMONICA_WATCH_INTERVAL"] = "0"
+    os.environ["MENMONICA_WORD_BACKEND"] = "files"
+    errors = []
+    try:
+        words = generate_words(6000, seed=11)
+        write_cache_json(words[:3000], "two_digit_cache.json")
+        write_dictionary_db(words, "dictionary.db")
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, "build_word_index.py")],
+                       check=True, stdout=subprocess.DEVNULL)
+
+        import main as app_main
+        import word_journal
+        import word_store
+        from major_encoder import encode_word
+
+        before = word_store.get_snapshot().index
+        db_only = words[-1]
+        db_number = encode_word(db_only)
+        print(f"{type(before).__name__}: {before.word_count} words")
+
+        new_word = "zzquadrozz"
+        app_main.save_to_cache([(new_word, "")], encode_word(new_word)[:2])
+        steps = [("save_to_cache", word_store.get_snapshot())]
+        word_store._snapshot = None
+        steps.append(("reload", word_store.get_snapshot()))
+        word_journal.compact()
+        word_store._snapshot = None
+        steps.append(("compact + reload", word_store.get_snapshot()))
+
+        for step, snap in steps:
+            index = snap.index
+            print(f"after {step}: {type(index).__name__}, {index.word_count} words")
+            if index.word_count != before.word_count + 1:
+                errors.append(f"{step}: {index.word_count} words, expected {before.word_count + 1}")
+            if db_only not in index.exact(db_number):
+                errors.append(f"{step}: DB-only word {db_only!r} disappeared")
+            for label, lookup in (("index", index), ("lookup index", snap.lookup_index)):
+                if new_word not in lookup.exact(encode_word(new_word)):
+                    errors.append(f"{step}: saved word {new_word!r} missing from the {label}")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if errors:
+        print(f"{len(errors)} violation(s), first: {errors[0]}")
+        sys.exit(1)
+    print("Mapped index kept across journal writes and compactions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare two run_benchmarks.py result files and flag regressions.
+
+    python benchmarks/compare_results.py base.json new.json --threshold 0.15
+
+Exits with status 1 when any benchmark got slower than the threshold (relative change
+of the chosen metric), so it can gate a deploy or CI step.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Tuple[Dict, Dict[Tuple, Dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    results = {(r["size"], r["backend"], r["name"]): r for r in report.get("results", [])}
+    return report.get("meta", {}), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base", help="Baseline results (e.g. from the last deployed commit)")
+    parser.add_argument("new", help="Results to check")
+    parser.add_argument("--metric", choices=["median", "mean", "p95", "min"], default="median",
+                        help="Statistic to compare (default: median)")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative slowdown that counts as a regression (default: 0.15 = 15%%)")
+    args = parser.parse_args()
+
+    base_meta, base = load(args.base)
+    new_meta, new = load(args.new)
+    print(f"base: {base_meta.get('commit')}  new: {new_meta.get('commit')}  metric: {args.metric}")
+
+    regressions = 0
+    for key in sorted(set(base) & set(new)):
+        before, after = base[key][args.metric], new[key][args.metric]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        size, backend, name = key
+        print(f"{size:>8} {backend:<7} {name:<40} {before:>12.4f} -> {after:>12.4f} ms  {change:+7.1%}{flag}")
+
+    for key in sorted(set(base) ^ set(new)):
+        print(f"{key[0]:>8} {key[1]:<7} {key[2]:<40} only in {'base' if key in base else 'new'}")
+
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Reproducible benchmarks for the hot paths: Major encoding, segmentation, single-digit
+lookups (against a local stub of the dictionary API) and the HTTP endpoints through
+the Flask test client.
+
+Every dictionary size runs in its own fresh process and working directory, so module
+level caches never leak between sizes. Inputs are seeded, so two runs on different
+commits time exactly the same work; compare them with compare_results.py.
+
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --out bench.json
+    python benchmarks/compare_results.py base.json bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_words, parse_size, write_cache_json, write_dictionary_db  # noqa: E402
+
+# The stub API searches at most this many words (infix search is a linear scan)
+STUB_VOCABULARY = 20000
+
+
+def summarize(name: str, samples_ns: List[float], ops: int, rounds: int) -> Dict:
+    ms = sorted(s / 1e6 for s in samples_ns)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    mean = statistics.fmean(ms)
+    return {
+        "name": name,
+        "unit": "ms/op",
+        "ops": ops,
+        "rounds": rounds,
+        "median": round(statistics.median(ms), 6),
+        "mean": round(mean, 6),
+        "p95": round(p95, 6),
+        "min": round(ms[0], 6),
+        "max": round(ms[-1], 6),
+        "ops_per_s": round(1000.0 / mean, 1) if mean else None,
+    }
+
+
+def per_call(name: str, fn: Callable, items: list, rounds: int, setup: Optional[Callable] = None) -> Dict:
+    """Time every call separately; percentiles are over single calls."""
+    if items:
+        if setup:
+            setup()
+        fn(items[0])  # warm-up (lazy imports, first snapshot load)
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        for item in items:
+            t0 = time.perf_counter_ns()
+            fn(item)
+            samples.append(time.perf_counter_ns() - t0)
+    return summarize(name, samples, len(samples), rounds)
+
+
+def per_round(name: str, fn: Callable, items: list, rounds: int, setup: Optional[Callable] = None) -> Dict:
+    """Time whole passes over `items` (for sub-microsecond calls); reports time per item."""
+    samples = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        t0 = time.perf_counter_ns()
+        fn(items)
+        samples.append((time.perf_counter_ns() - t0) / max(1, len(items)))
+    return summarize(name, samples, len(items) * rounds, rounds)
+
+
+def random_number(rng: random.Random, low: int, high: int) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(rng.randint(low, high)))
+
+
+def run_worker(args) -> List[Dict]:
+    """Runs inside the per-size subprocess, with the working directory already prepared."""
+    os.chdir(args.workdir)
+    conn = sqlite3.connect("dictionary.db")
+    vocabulary = [r[0] for r in conn.execute("SELECT word FROM words ORDER BY id LIMIT ?", (STUB_VOCABULARY,))]
+    conn.close()
+
+    sys.path.insert(0, REPO_DIR)
+    from stub_api import StubDictionaryAPI
+
+    stub = StubDictionaryAPI(vocabulary, latency_ms=args.api_latency_ms).start()
+    os.environ["DICIONARIO_API_URL"] = stub.url
+    os.environ["MENMONICA_API_CACHE"] = os.path.join(args.workdir, "api_cache.db")
+    os.environ["MENMONICA_WORD_BACKEND"] = "sqlite" if args.backend == "sqlite" else "files"
+    if args.preload:
+        os.environ["MENMONICA_PRELOAD"] = "1"
+
+    import api_cache
+    import main
+    import word_store
+    from app import app
+    from major_encoder import encode_many
+
+    rng = random.Random(args.seed)
+    rounds = args.rounds
+    results: List[Dict] = []
+
+    def add(result: Dict) -> None:
+        results.append(result)
+        print(f"  {result['name']:<40} median {result['median']:.4f} ms  p95 {result['p95']:.4f} ms",
+              file=sys.stderr, flush=True)
+
+    # --- encoder -----------------------------------------------------------
+    sample_words = [rng.choice(vocabulary) for _ in range(20000)]
+
+    def encode_all(words):
+        for w in words:
+            main.word_to_major_number(w)
+
+    add(per_round("encode.word_to_major_number", encode_all, sample_words, rounds,
+                  setup=main.word_to_major_number.cache_clear))
+    add(per_round("encode.word_to_major_number.cached", encode_all, sample_words, rounds))
+    add(per_round("encode.encode_many", encode_many, sample_words, rounds))
+
+    # --- word data ---------------------------------------------------------
+    add(per_call("snapshot.load", lambda _: word_store.load_snapshot(), [None], max(3, rounds)))
+
+    # --- single digits (stub API) --------------------------------------------
+    digits = list("0123456789")
+
+    def forget_digits(api_too: bool):
+        def setup():
+            main.find_single_digit_words.cache_clear()
+            if os.path.exists("digit_cache.json"):
+                os.remove("digit_cache.json")
+            if api_too:
+                api_cache.get_cache().clear()
+        return setup
+
+    single_rounds = max(1, min(rounds, 3))
+    add(per_call("find_single_digit_words.api_cold", main.find_single_digit_words, digits, single_rounds,
+                 setup=forget_digits(api_too=True)))
+    add(per_call("find_single_digit_words.api_cached", main.find_single_digit_words, digits, single_rounds,
+                 setup=forget_digits(api_too=False)))
+    add(per_call("find_single_digit_words.file", main.find_single_digit_words, digits, rounds,
+                 setup=main.find_single_digit_words.cache_clear))
+
+    # --- segmentation ----------------------------------------------------------
+    numbers = [random_number(rng, 4, 16) for _ in range(200)]
+    add(per_call("find_pairs_combinations", lambda n: main.find_pairs_combinations(n, verbose=False),
+                 numbers, rounds))
+
+    # --- HTTP --------------------------------------------------------------
+    client = app.test_client()
+
+    def post(body):
+        r = client.post("/api/convert", json=body)
+        assert r.status_code == 200, r.status_code
+
+    add(per_call("http.convert.digits", lambda n: post({"number": n, "maxCombos": 50}), numbers, rounds))
+    block_sets = [" ".join(random_number(rng, 1, 8) for _ in range(3)) for _ in range(100)]
+    add(per_call("http.convert.blocks", lambda b: post({"blocks": b, "maxCombos": 50}), block_sets, rounds))
+    phrases = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 8))) for _ in range(100)]
+    add(per_call("http.convert.text", lambda t: post({"text": t}), phrases, rounds))
+    add(per_call("http.convert.rank", lambda n: post({"number": n, "maxCombos": 20, "rank": True}),
+                 numbers[:50], rounds))
+    batches = [[random_number(rng, 4, 16) for _ in range(50)] for _ in range(20)]
+
+    def post_batch(items):
+        r = client.post("/api/convert/batch", json={"items": items, "maxCombos": 20})
+        assert r.status_code == 200, r.status_code
+
+    add(per_call("http.convert.batch50", post_batch, batches, rounds))
+
+    def random_phrase(_):
+        r = client.get("/api/random_phrase?words=3")
+        assert r.status_code in (200, 503), r.status_code
+
+    add(per_call("http.random_phrase", random_phrase, list(range(500)), rounds))
+
+    stub.stop()
+    return results
+
+
+def prepare_workdir(size: int, seed: int, backend: str, workdir: str) -> Dict:
+    started = time.perf_counter()
+    words = generate_words(size, seed)
+    cached = write_cache_json(words, os.path.join(workdir, "two_digit_cache.json"))
+    write_dictionary_db(words, os.path.join(workdir, "dictionary.db"))
+    build = os.path.join(REPO_DIR, "build_word_index.py")
+    if backend == "mapped":
+        subprocess.run([sys.executable, build], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    elif backend == "sqlite":
+        subprocess.run([sys.executable, build, "--sqlite"], cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    return {"words": size, "cache_words": cached, "prepare_s": round(time.perf_counter() - started, 3)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the encoder, segmentation and HTTP endpoints.")
+    parser.add_argument("--sizes", default="10k", help="Comma-separated dictionary sizes, e.g. 10k,100k,1M (default: 10k)")
+    parser.add_argument("--backend", choices=["files", "mapped", "sqlite"], default="files",
+                        help="Word data backend: JSON cache, word_index.bin, or the sqlite table (default: files)")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed passes per benchmark (default: 5)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for dictionaries and inputs (default: 1)")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0,
+                        help="Artificial latency added by the stub dictionary API (default: 0)")
+    parser.add_argument("--preload", action="store_true", help="Run with MENMONICA_PRELOAD=1")
+    parser.add_argument("--out", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated working directories")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "backend": args.backend,
+            "rounds": args.rounds,
+            "seed": args.seed,
+            "api_latency_ms": args.api_latency_ms,
+            "preload": args.preload,
+        },
+        "datasets": [],
+        "results": [],
+    }
+    for size_text in args.sizes.split(","):
+        size = parse_size(size_text)
+        workdir = tempfile.mkdtemp(prefix=f"menmonica-bench-{size}-")
+        try:
+            print(f"[{size} words, backend={args.backend}] preparing {workdir}", file=sys.stderr, flush=True)
+            dataset = prepare_workdir(size, args.seed, args.backend, workdir)
+            report["datasets"].append(dataset)
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--workdir", workdir,
+                   "--backend", args.backend, "--rounds", str(args.rounds), "--seed", str(args.seed),
+                   "--api-latency-ms", str(args.api_latency_ms)]
+            if args.preload:
+                cmd.append("--preload")
+            out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+            for result in json.loads(out.strip().splitlines()[-1]):
+                report["results"].append({"size": size, "backend": args.backend, **result})
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Wrote {len(report['results'])} results to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Concurrency stress test for word_store: reader threads hammer get_snapshot() while
+a writer keeps replacing two_digit_cache.json (picked up by the background watcher)
+and a publisher extends the snapshot in-process, as save_to_cache does.
+
+Each generation g of the file holds exactly `base + g % 7` words in every pair
+01-99, and the publisher only touches pair 00. A reader that ever sees pairs
+01-99 with different sizes, or an index that disagrees with the snapshot's pairs,
+has observed a half-built snapshot. Exits 1 on any violation.
+
+    python benchmarks/stress_snapshots.py --seconds 10 --readers 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic import build_cache, generate_words  # noqa: E402
+
+PAIRS = [f"{i:02d}" for i in range(1, 100)]
+
+
+def generation_cache(pool, base, g):
+    size = base + g % 7
+    cache = {pair: pool[pair][:size] for pair in PAIRS}
+    cache["00"] = pool["00"][:1]
+    return cache
+
+
+def check(snap, errors):
+    pairs = snap.pairs
+    sizes = {len(pairs.get(p, ())) for p in PAIRS}
+    if len(sizes) != 1:
+        errors.append(f"mixed pair sizes in one snapshot: {sorted(sizes)}")
+    index = snap.index
+    for p in ("01", "42", "99", "00"):
+        if index.pair_size(p) != len(pairs.get(p, ())):
+            errors.append(f"index/pairs disagree on {p}: {index.pair_size(p)} vs {len(pairs.get(p, ()))}")
+    expected = sum(len(v) for v in pairs.values())
+    if index.word_count != expected:
+        errors.append(f"index word_count {index.word_count} != {expected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress word_store snapshot swapping under concurrent readers.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--base", type=int, default=20, help="Words per pair in generation 0 (default: 20)")
+    parser.add_argument("--interval", type=float, default=0.01, help="Watcher interval in seconds (default: 0.01)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="menmonica-stress-")
+    os.chdir(workdir)
+    os.environ["MENMONICA_WATCH_INTERVAL"] = str(args.interval)
+    os.environ["MENMONICA_WORD_BACKEND"] = "files"
+
+    import word_journal
+    import word_store
+
+    # Enough words per pair for the largest generation
+    need = args.base + 7
+    pool = {}
+    seed = 1
+    while len(pool) < 100 or any(len(pool[p]) < need for p in pool):
+        for pair, entries in build_cache(generate_words(20000, seed)).items():
+            bucket = pool.setdefault(pair, [])
+            known = {e["word"] for e in bucket}
+            bucket.extend(e for e in entries if e["number"][:2] == pair and e["word"] not in known)
+        seed += 1
+
+    word_journal.write_cache(generation_cache(pool, args.base, 0))
+    stop = threading.Event()
+    errors = []
+    reads = [0] * args.readers
+    swaps = {"files": 0, "publishes": 0}
+
+    def reader(i):
+        seen = None
+        while not stop.is_set():
+            snap = word_store.get_snapshot()
+            if snap is not seen:
+                check(snap, errors)
+                seen = snap
+            reads[i] += 1
+            if reads[i] % 1000 == 0:
+                time.sleep(0)  # let the writer and the watcher run
+
+    def writer():
+        g = 0
+        while not stop.is_set():
+            g += 1
+            word_journal.write_cache(generation_cache(pool, args.base, g))
+            swaps["files"] += 1
+            time.sleep(args.interval * 2)
+
+    def publisher():
+        extra = iter(pool["00"][1:])
+        while not stop.is_set():
+            entry = next(extra, None)
+            if entry is None:
+                break
+            word_store.publish("00", [entry])
+            swaps["publishes"] += 1
+            time.sleep(args.interval)
+
+    word_store.watch()
+    word_store.get_snapshot()  # starts the watcher
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer), threading.Thread(target=publisher)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    word_store.stop_watcher()
+    os.chdir(REPO_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    total = sum(reads)
+    print(f"{total} snapshot reads by {args.readers} threads in {elapsed:.1f}s ({total / elapsed:,.0f}/s); "
+          f"{swaps['files']} file rewrites, {swaps['publishes']} in-process publishes")
+    if errors:
+        print(f"{len(errors)} violation(s), first: {errors[0]}")
+        sys.exit(1)
+    print("No partial snapshots observed.")
+
+
+if __name__ == "__main__":
+    main()
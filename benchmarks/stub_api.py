@@ -0,0 +1,78 @@
+"""
+Local stand-in for api.dicionario-aberto.net, so API-bound code paths can be timed
+without the network. Point the app at it with DICIONARIO_API_URL.
+"""
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import unquote
+
+
+class StubDictionaryAPI:
+    """
+    Serves GET /prefix/<query> and GET /infix/<query> as JSON lists of {"word": ...}
+    over a fixed vocabulary, with an optional artificial latency per request.
+    """
+
+    def __init__(self, words: List[str], limit: int = 100, latency_ms: float = 0.0):
+        self.words = sorted(set(words))
+        self.lower = [w.lower() for w in self.words]
+        self.limit = limit
+        self.latency = latency_ms / 1000.0
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def search(self, search_type: str, query: str) -> List[dict]:
+        q = query.lower()
+        if search_type == "prefix":
+            i = bisect.bisect_left(self.lower, q)
+            found = []
+            while i < len(self.lower) and self.lower[i].startswith(q) and len(found) < self.limit:
+                found.append(self.words[i])
+                i += 1
+        else:
+            found = [w for w, lw in zip(self.words, self.lower) if q in lw][: self.limit]
+        return [{"word": w} for w in found]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubDictionaryAPI":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.strip("/").split("/", 1)
+                if len(parts) != 2 or parts[0] not in ("prefix", "infix"):
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = json.dumps(stub.search(parts[0], unquote(parts[1])), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
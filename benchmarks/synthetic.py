@@ -0,0 +1,76 @@
+"""
+Deterministic synthetic dictionaries for the benchmarks, in the same shapes the app
+reads: two_digit_cache.json ({pair: [{"word", "number"}]}) and dictionary.db (table
+`words(id, word)`, as created by seed_words_into_db.py).
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from major_encoder import encode_many  # noqa: E402
+
+CONSONANTS = ["b", "c", "ch", "d", "f", "g", "gu", "j", "l", "lh", "ll", "m", "n", "nh",
+              "p", "qu", "r", "rr", "s", "ss", "t", "v", "x", "z", "ç"]
+VOWELS = ["a", "e", "i", "o", "u", "ã", "é", "ê", "í", "ó", "ão", "ei", "ou"]
+SUFFIXES = ["-feira", "'s", " de", "s", "mente", "ção"]
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    text = text.strip().lower()
+    scale = 1
+    if text.endswith("k"):
+        scale, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        scale, text = 1000000, text[:-1]
+    return int(float(text) * scale)
+
+
+def generate_words(count: int, seed: int = 1) -> List[str]:
+    """`count` distinct Portuguese-looking words; same seed -> same list."""
+    rng = random.Random(seed)
+    seen = set()
+    words: List[str] = []
+    while len(words) < count:
+        w = "".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(1, 5)))
+        if rng.random() < 0.1:
+            w = rng.choice(VOWELS) + w
+        if rng.random() < 0.05:
+            w += rng.choice(SUFFIXES)
+        if w not in seen:
+            seen.add(w)
+            words.append(w)
+    return words
+
+
+def build_cache(words: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    cache: Dict[str, List[Dict[str, str]]] = {}
+    for w, number in zip(words, encode_many(words)):
+        if len(number) >= 2:
+            cache.setdefault(number[:2], []).append({"word": w, "number": number})
+    return cache
+
+
+def write_cache_json(words: List[str], path: str) -> int:
+    cache = build_cache(words)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=4)
+    return sum(len(v) for v in cache.values())
+
+
+def write_dictionary_db(words: List[str], path: str) -> int:
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE words (id INTEGER PRIMARY KEY AUTOINCREMENT, word TEXT)")
+        conn.executemany("INSERT INTO words (word) VALUES (?)", ((w,) for w in words))
+        conn.commit()
+    finally:
+        conn.close()
+    return len(words)
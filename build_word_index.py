@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+
+from major_encoder import encode_many
+from populate_two_digit_cache_from_db import DEFAULT_CACHE_PATH, DEFAULT_DB_PATH, detect_word_source, load_cache, normalize_word
+from word_index import WORD_TABLE, write_index_file, write_word_table
+from word_shards import SHARD_DIR, write_shards
+
+DEFAULT_INDEX_PATH = "word_index.bin"
+DEFAULT_DIGIT_CACHE_PATH = "digit_cache.json"
+
+
+def collect_cache_words(cache: Dict[str, list]) -> Tuple[List[str], Dict[str, int]]:
+    """Return the cache words in order plus the per-pair sizes as they are in the JSON cache."""
+    words: List[str] = []
+    pair_sizes: Dict[str, int] = {}
+    for pair, entries in cache.items():
+        if not isinstance(entries, list):
+            continue
+        count = 0
+        for e in entries:
+            w = normalize_word(e.get("word")) if isinstance(e, dict) else None
+            if w:
+                words.append(w)
+                count += 1
+        pair_sizes[pair] = count
+    return words, pair_sizes
+
+
+def load_digit_words(path: str) -> Dict[str, List[str]]:
+    """Single-digit words from digit_cache.json ({digit: [{"word": ...}]}); empty if missing."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    words: Dict[str, List[str]] = {}
+    for digit, entries in cache.items():
+        if len(digit) == 1 and digit.isdigit() and isinstance(entries, list):
+            words[digit] = [e["word"] for e in entries if isinstance(e, dict) and isinstance(e.get("word"), str) and e["word"]]
+    return words
+
+
+def iter_db_words(db_path: str, table: str = None, column: str = None, batch_size: int = 5000):
+    """Yield batches of words from dictionary.db, auto-detecting the source table/column."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if not table or not column:
+            detected = detect_word_source(conn)
+            if not detected:
+                print("WARNING: could not auto-detect a word source in the DB; skipping it.")
+                return
+            table, column = detected
+            print(f"Detected words source: table='{table}', column='{column}'")
+        cur = conn.cursor()
+        cur.execute(f"SELECT {column} FROM '{table}'")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [w for w in (normalize_word(r[0]) for r in rows) if w]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile two_digit_cache.json (and dictionary.db) into the compact, memory-mappable word_index.bin."
+    )
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path to two_digit_cache.json (default: two_digit_cache.json)")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to SQLite DB file (default: dictionary.db)")
+    parser.add_argument("--no-db", action="store_true", help="Only compile the JSON cache, ignoring the DB")
+    parser.add_argument("--table", help="Optional table name override")
+    parser.add_argument("--column", help="Optional column name override (word/lemma column)")
+    parser.add_argument("--out", default=DEFAULT_INDEX_PATH, help="Output file (default: word_index.bin)")
+    parser.add_argument("--sqlite", action="store_true",
+                        help=f"Instead of word_index.bin, (re)build the indexed '{WORD_TABLE}' table inside --db "
+                             "for MENMONICA_WORD_BACKEND=sqlite")
+    parser.add_argument("--shards", nargs="?", const=SHARD_DIR, metavar="DIR",
+                        help=f"Instead of word_index.bin, write one shard file per pair (plus single digits) into DIR "
+                             f"(default: {SHARD_DIR}) for MENMONICA_WORD_BACKEND=shards")
+    parser.add_argument("--digits", default=DEFAULT_DIGIT_CACHE_PATH,
+                        help="digit_cache.json with the single-digit words for --shards (default: digit_cache.json)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    words, pair_sizes = collect_cache_words(load_cache(args.cache))
+    print(f"Cache words: {len(words)} in {len(pair_sizes)} pairs")
+
+    by_number: Dict[str, List[str]] = {}
+    seen = set()
+
+    def add(batch: List[str], count_pairs: bool) -> int:
+        added = 0
+        for w, number in zip(batch, encode_many(batch)):
+            if not number or (number, w) in seen:
+                continue
+            seen.add((number, w))
+            by_number.setdefault(number, []).append(w)
+            added += 1
+            if count_pairs and len(number) >= 2:
+                pair_sizes[number[:2]] = pair_sizes.get(number[:2], 0) + 1
+        return added
+
+    add(words, count_pairs=False)
+
+    if not args.no_db and os.path.exists(args.db):
+        db_added = 0
+        for batch in iter_db_words(args.db, args.table, args.column):
+            db_added += add(batch, count_pairs=True)
+        print(f"DB words added: {db_added}")
+
+    if args.sqlite:
+        rows = write_word_table(args.db, ((w, n) for n, ws in by_number.items() for w in ws), replace=True)
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {rows} rows into {args.db}:{WORD_TABLE} in {elapsed:.2f}s")
+        return
+
+    if args.shards:
+        n_shards, n_words = write_shards(args.shards, by_number, pair_sizes, load_digit_words(args.digits))
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {n_shards} shards with {n_words} words into {args.shards}/ in {elapsed:.2f}s")
+        return
+
+    n_numbers, n_words = write_index_file(args.out, by_number, pair_sizes)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.out}: {n_words} words under {n_numbers} numbers, "
+          f"{os.path.getsize(args.out)} bytes in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
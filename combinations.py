@@ -0,0 +1,98 @@
+import base64
+import random
+import sys
+import zlib
+
+
+def product_size(word_lists):
+    """Número total de combinações (produto dos tamanhos das listas)."""
+    total = 1
+    for words in word_lists:
+        total *= len(words)
+    return total
+
+
+def combination_at(word_lists, position):
+    """
+    Combinação na posição `position` da ordem de itertools.product (a última lista
+    varia mais depressa), calculada em O(partições) por decomposição em base mista.
+    """
+    picked = []
+    for words in reversed(word_lists):
+        position, digit = divmod(position, len(words))
+        picked.append(words[digit])
+    picked.reverse()
+    return picked
+
+
+def iter_combinations(word_lists, start=0):
+    """
+    Combinações a partir da posição `start`, pela ordem de itertools.product,
+    sem enumerar as anteriores: a posição inicial é decomposta uma vez e depois
+    avança como um conta-quilómetros.
+    """
+    if not word_lists or start >= product_size(word_lists):
+        return
+    digits = []
+    position = start
+    for words in reversed(word_lists):
+        position, digit = divmod(position, len(words))
+        digits.append(digit)
+    digits.reverse()
+    last = len(word_lists) - 1
+    while True:
+        yield [words[d] for words, d in zip(word_lists, digits)]
+        k = last
+        while k >= 0:
+            digits[k] += 1
+            if digits[k] < len(word_lists[k]):
+                break
+            digits[k] = 0
+            k -= 1
+        if k < 0:
+            return
+
+
+def sample_positions(total, k, rng=None):
+    """k posições distintas escolhidas uniformemente em [0, total), sem percorrer o intervalo."""
+    rng = rng or random
+    k = min(k, total)
+    if total <= sys.maxsize:
+        return rng.sample(range(total), k)
+    # Espaços enormes (len(range) não cabe num ssize_t): colisões são praticamente impossíveis
+    picked = {}
+    while len(picked) < k:
+        picked.setdefault(rng.randrange(total), None)
+    return list(picked)
+
+
+def _signature(word_lists, ordering):
+    h = zlib.crc32(ordering.encode('ascii'))
+    for words in word_lists:
+        h = zlib.crc32(len(words).to_bytes(4, 'little'), h)
+        h = zlib.crc32('\x1f'.join(words[:1] + words[-1:]).encode('utf-8'), h)
+    return h
+
+
+def encode_cursor(word_lists, position, ordering='product'):
+    """
+    Cursor opaco e sem estado: a posição no espaço de combinações mais uma assinatura
+    das partições (e da ordenação usada), para detetar cursores usados com outro
+    número/outros dados.
+    """
+    raw = f"{position:x}.{_signature(word_lists, ordering):08x}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(word_lists, cursor, ordering='product'):
+    """Posição codificada em `cursor`; ValueError se for inválido ou de outras partições."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        position_hex, signature_hex = raw.split('.')
+        position = int(position_hex, 16)
+        signature = int(signature_hex, 16)
+    except (ValueError, TypeError, UnicodeDecodeError, AttributeError):
+        raise ValueError('cursor inválido')
+    if signature != _signature(word_lists, ordering) or position < 0:
+        raise ValueError('cursor não corresponde a estas partições')
+    return position
@@ -0,0 +1,101 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import api_cache
+import metrics
+
+# URL base da API do dicionário (pode apontar para um servidor local de testes)
+API_BASE_URL = os.environ.get('DICIONARIO_API_URL', 'https://api.dicionario-aberto.net')
+# Pedidos em paralelo e timeout (segundos) por pedido
+MAX_WORKERS = int(os.environ.get('MENMONICA_API_WORKERS', '16'))
+TIMEOUT = float(os.environ.get('MENMONICA_API_TIMEOUT', '10'))
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Sessão HTTP partilhada com pool de ligações (keep-alive) dimensionado para
+    MAX_WORKERS pedidos simultâneos. É recriada após um fork.
+    """
+    global _session, _session_pid
+    session = _session
+    if session is not None and _session_pid == os.getpid():
+        return session
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            # Importado só aqui: requests é pesado e só o caminho sem cache precisa dele
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _request(query, search_type, base_url=None, timeout=None):
+    """
+    Faz o pedido e devolve (resultados, guardável). Só respostas efetivas da API
+    (200, ou 404 = sem resultados) são guardáveis; erros e timeouts não.
+    """
+    url = f"{(base_url or API_BASE_URL).rstrip('/')}/{search_type}/{query}"
+    with metrics.stage('dictionary_api'):
+        try:
+            response = get_session().get(url, timeout=timeout or TIMEOUT)
+            if response.status_code == 200:
+                data = response.json()
+                metrics.API_REQUESTS.inc(result='ok')
+                return (data if isinstance(data, list) else []), True
+            metrics.API_REQUESTS.inc(result=f'http_{response.status_code}')
+            return [], response.status_code == 404
+        except Exception as e:
+            metrics.API_REQUESTS.inc(result='error')
+            print(f"Erro ao buscar {query}: {e}")
+    return [], False
+
+
+def fetch_words(query, search_type, base_url=None, timeout=None):
+    """
+    Faz um pedido `search_type` (prefix/infix) à API e devolve a lista de resultados
+    ({"word": ...}); em caso de erro ou timeout devolve [].
+    """
+    return _request(query, search_type, base_url, timeout)[0]
+
+
+def fetch_words_cached(query, search_type, cache=None):
+    """
+    Como fetch_words, mas consulta primeiro a cache persistente de respostas
+    (api_cache.py) e guarda lá as respostas novas. Falhas não ficam em cache.
+    """
+    cache = cache or api_cache.get_cache()
+    results = cache.get(query, search_type)
+    metrics.cache_lookup('fetch_words_from_api', results is not None)
+    if results is None:
+        results, cacheable = _request(query, search_type)
+        if cacheable:
+            cache.put(query, search_type, results)
+    return results
+
+
+def fetch_many(jobs, fetch=fetch_words, max_workers=None):
+    """
+    Executa os pedidos (query, search_type) em paralelo (no máximo max_workers de cada vez)
+    e devolve ((query, search_type), resultados) à medida que vão chegando.
+    """
+    jobs = list(dict.fromkeys(jobs))
+    if not jobs:
+        return
+    workers = max(1, min(max_workers or MAX_WORKERS, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dicionario-api') as pool:
+        futures = {pool.submit(fetch, query, search_type): (query, search_type) for query, search_type in jobs}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception:
+                results = []
+            yield futures[future], results
@@ -0,0 +1,164 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from segmentation import best_split
+
+# Números com mais de CHUNK_DIGITS dígitos são divididos em blocos. A linha de comandos monta
+# as tabelas dos blocos num pool de LONG_WORKERS processos; a app monta-as no próprio processo
+# (criar um pool por pedido num worker com threads é caro e pode herdar locks de outras threads)
+CHUNK_DIGITS = int(os.environ.get('MENMONICA_LONG_CHUNK', '5000'))
+LONG_WORKERS = int(os.environ.get('MENMONICA_LONG_WORKERS', '0')) or (os.cpu_count() or 1)
+
+# Índice usado por _chunk_span_ends nos processos do pool (definido por _init_worker)
+_worker_index = None
+
+
+def clean_digits(text):
+    """Só os dígitos, para aceitar constantes coladas ("3.14159 26535...") tal como vêm."""
+    return ''.join(ch for ch in text if '0' <= ch <= '9')
+
+
+def _init_worker(index):
+    global _worker_index
+    if index is None:
+        # Sem fork o processo não herda o snapshot do pai: carregá-lo aqui
+        from main import get_word_index
+        index = get_word_index()
+    _worker_index = index
+
+
+def _chunk_span_ends(job):
+    """
+    Fins dos spans para as primeiras `rows` posições de `text` (o bloco em `offset`, mais
+    window - 1 dígitos de sobreposição). Os mesmos spans de segmentation.build_span_table.
+    """
+    text, offset, rows, window, digits_with_words = job
+    prefixes_of = _worker_index.prefixes_of
+    ends = []
+    for i in range(rows):
+        at = offset + i
+        row = [at + 1] if text[i] in digits_with_words else []
+        row.extend(at + len(prefix) for prefix, _ in prefixes_of(text[i:i + window], min_length=2))
+        ends.append(row)
+    return ends
+
+
+def _pool_context():
+    # Com fork os processos partilham o snapshot do pai em copy-on-write em vez de o recarregar
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def build_span_ends(number, index, digits_with_words=(), workers=None, chunk=None):
+    """
+    ends[i] = todos os j tais que number[i:j] tem palavras, para o número inteiro.
+    Os blocos sobrepõem-se em max_length - 1 dígitos: um span que atravessa a fronteira
+    é encontrado pelo bloco onde começa, e a tabela é igual à de uma só passagem.
+    Com workers > 1 os blocos vão para um pool de processos; por omissão, no próprio processo.
+    """
+    workers = workers or 1
+    chunk = max(1, chunk or CHUNK_DIGITS)
+    window = max(index.max_length, 2)
+    digits_with_words = frozenset(digits_with_words)
+    starts = range(0, len(number), chunk)
+    jobs = [(number[s:s + chunk + window - 1], s, min(chunk, len(number) - s), window, digits_with_words)
+            for s in starts]
+
+    ends = []
+    if workers <= 1 or len(jobs) <= 1:
+        _init_worker(index)
+        for rows in map(_chunk_span_ends, jobs):
+            ends.extend(rows)
+        return ends
+
+    context = _pool_context()
+    initargs = (index if context.get_start_method() == 'fork' else None,)
+    with context.Pool(min(workers, len(jobs)), initializer=_init_worker, initargs=initargs) as pool:
+        # imap mantém a ordem dos blocos enquanto são calculados em paralelo
+        for rows in pool.imap(_chunk_span_ends, jobs):
+            ends.extend(rows)
+    return ends
+
+
+def iter_partitions(number, index, digit_words=None, workers=None, chunk=None):
+    """
+    As mesmas partições de segmentation.segment_number (o menor número de partes no
+    número inteiro), entregues por ordem. As palavras de cada parte só são procuradas
+    quando a parte é entregue.
+    """
+    digit_words = digit_words or {}
+    ends = build_span_ends(number, index, [d for d, ws in digit_words.items() if ws], workers, chunk)
+    for i, j in best_split(ends):
+        words = digit_words.get(number[i]) if j - i == 1 else index.exact(number[i:j])
+        words = sorted({w for w in words or () if isinstance(w, str) and w}, key=lambda w: w.lower())
+        yield {'sequence': number[i:j], 'start': i, 'words': words}
+
+
+def single_digit_word_map(number):
+    """Palavras de cada dígito distinto de `number` (digit_cache.json ou a API, como na app)."""
+    from main import find_single_digit_words
+    words = {}
+    for digit in sorted(set(number)):
+        try:
+            words[digit] = [w for w, _ in find_single_digit_words(digit)]
+        except Exception:
+            words[digit] = []
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Divide um número muito longo (milhares a milhões de dígitos) em palavras, com um pool de processos.'
+    )
+    parser.add_argument('number', nargs='?', help='Os dígitos (o resto é ignorado). Omitir para ler --file ou o stdin.')
+    parser.add_argument('--file', help="Ler os dígitos deste ficheiro ('-' para o stdin)")
+    parser.add_argument('--workers', type=int, default=LONG_WORKERS,
+                        help=f'Processos para as tabelas de spans (por omissão: {LONG_WORKERS}; 1 = sem pool)')
+    parser.add_argument('--chunk', type=int, default=CHUNK_DIGITS,
+                        help=f'Dígitos por bloco (por omissão: {CHUNK_DIGITS})')
+    parser.add_argument('--json', action='store_true', help='Escrever um objeto JSON por parte (NDJSON)')
+    parser.add_argument('--no-api', action='store_true',
+                        help='Não pedir à API os pares que faltam na cache')
+    args = parser.parse_args()
+
+    if args.number:
+        text = args.number
+    elif args.file and args.file != '-':
+        with open(args.file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+    number = clean_digits(text)
+    if not number:
+        parser.error('não há dígitos na entrada')
+
+    from main import ensure_pair_cached, get_word_index
+    started = time.perf_counter()
+    if not args.no_api:
+        for pair in sorted({number[i:i + 2] for i in range(len(number) - 1)}):
+            ensure_pair_cached(pair)
+    index = get_word_index()
+    digit_words = single_digit_word_map(number)
+
+    parts = covered = 0
+    out = sys.stdout
+    for part in iter_partitions(number, index, digit_words, args.workers, args.chunk):
+        parts += 1
+        covered += len(part['sequence'])
+        if args.json:
+            out.write(json.dumps(part, ensure_ascii=False) + '\n')
+        else:
+            out.write(f"{part['start']:>8} {part['sequence']}: {', '.join(part['words'][:8])}"
+                      f"{' ...' if len(part['words']) > 8 else ''}\n")
+    elapsed = time.perf_counter() - started
+    print(f'{len(number)} dígitos -> {parts} partes, {len(number) - covered} dígitos sem palavras, '
+          f'{elapsed:.2f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,89 +1,34 @@
-import requests
 from functools import lru_cache
 import os
 import json
 
-# Mapeamento do Sistema Fonético Major
-major_system_mapping = {
-    "0": ["z", "s", "ss", "ç", "c"],
-    "1": ["t", "d"], 
-    "2": ["n", "nh"],
-    "3": ["m"],
-    "4": ["r", "rr"],  # "rr" é agora parte do algarismo 4
-    "5": ["l"],
-    "6": ["j", "sc", "x", "ch", "g", "ge", "gi"],
-    "7": ["q", "c", "g"],  # "g" será tratado separadamente
-    "8": ["f", "v"],
-    "9": ["p", "b"]
-}
-
-# Inverso do mapeamento
-inverse_mapping = {v: k for k, vs in major_system_mapping.items() for v in vs}
-
-# In-memory cache for two_digit_cache.json to avoid repeated disk I/O during requests
-two_digit_cache = None
-two_digit_cache_mtime = 0.0
+# Mapeamento do Sistema Fonético Major e codificador compilado (ver major_encoder.py)
+from major_encoder import major_system_mapping, inverse_mapping, encode_word, encode_many
+import dictionary_api
+from segmentation import IncrementalSegmenter
+import metrics
+import negative_cache
+import word_journal
+import word_store
 
+# Snapshot imutável de two_digit_cache.json partilhado pelo processo (ver word_store.py)
 def load_two_digit_cache():
-    global two_digit_cache, two_digit_cache_mtime
-    cache_file = 'two_digit_cache.json'
-    try:
-        mtime = os.path.getmtime(cache_file)
-    except OSError:
-        two_digit_cache = {}
-        two_digit_cache_mtime = 0.0
-        return two_digit_cache
-    if two_digit_cache is None or two_digit_cache_mtime != mtime:
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                two_digit_cache = json.load(f)
-            two_digit_cache_mtime = mtime
-        except Exception:
-            two_digit_cache = {}
-            two_digit_cache_mtime = mtime
-    return two_digit_cache
+    """
+    Devolve os pares da cache (mapeamento só de leitura par -> entradas)
+    """
+    return word_store.get_snapshot().pairs
+
+def get_word_index():
+    """
+    Devolve o índice de consulta do conteúdo atual de two_digit_cache.json
+    (o mesmo objeto enquanto o snapshot não mudar)
+    """
+    return word_store.get_snapshot().lookup_index
 
 # Função para converter uma palavra em um número pelo sistema fonético Major
 @lru_cache(maxsize=8192)
 def word_to_major_number(word):
-    number = ""
-    word = word.lower()
-    i = 0
-    while i < len(word):
-        # Verificar se encontramos "ss", para tratar como "0"
-        if i + 1 < len(word) and word[i] == "s" and word[i + 1] == "s":
-            number += "0"
-            i += 2  # Pular o próximo "s"
-        # Verificar se encontramos "ll", para tratar como "5"
-        elif i + 1 < len(word) and word[i] == "l" and word[i + 1] == "l":
-            number += "5"
-            i += 2  # Pular o próximo "l"
-        # Verificar se encontramos "rr", para tratar como "4"
-        elif i + 1 < len(word) and word[i] == "r" and word[i + 1] == "r":
-            number += "4"
-            i += 2  # Pular o próximo "r"
-        # Verificar se encontramos "ch", para tratar como "6"
-        elif i + 1 < len(word) and word[i] == "c" and word[i + 1] == "h":
-            number += "6"
-            i += 2  # Pular o "h"
-        # Verificar se "c" é seguido de "e" ou "i", para tratá-lo como "0"
-        elif word[i] == "c" and (i + 1 < len(word) and word[i + 1] in "ei"):
-            number += "0"
-            i += 2  # Pular o próximo "e" ou "i"
-        # Verificar se "g" é seguido de "e" ou "i", para tratá-lo como "6"
-        elif word[i] == "g" and (i + 1 < len(word) and word[i + 1] in "ei"):
-            number += "6"
-            i += 2  # Pular o próximo "e" ou "i"
-        # Verificar se "g" é seguido de "a", "o" ou "u", para tratá-lo como "7"
-        elif word[i] == "g" and (i + 1 < len(word) and word[i + 1] in "aou"):
-            number += "7"
-            i += 2  # Pular o próximo "a", "o" ou "u"
-        elif word[i] in inverse_mapping:
-            number += inverse_mapping[word[i]]
-            i += 1
-        else:
-            i += 1  # Pular letras que não fazem parte do mapeamento
-    return number
+    return encode_word(word)
 
 
 # Função para gerar combinações de vogais entre consoantes
@@ -120,29 +65,18 @@ def generate_special_vowel_combinations(consonant):
         combinations.append(f"{v}{consonant}")  # Vogais especiais + consoante
     return combinations
 
-# Cache API results to avoid redundant requests
-@lru_cache(maxsize=None)
+# Cache API results to avoid redundant requests (persistent and bounded, see api_cache.py)
 def fetch_words_from_api(query, search_type):
-    url = f"https://api.dicionario-aberto.net/{search_type}/{query}"
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json() if isinstance(response.json(), list) else []
-    except Exception as e:
-        print(f"Erro ao buscar {query}: {e}")
-    return []
+    return dictionary_api.fetch_words_cached(query, search_type)
 
 def is_cache_complete():
     """
     Verifica se a cache tem todas as combinações de dois dígitos (00-99)
     """
-    cache_file = 'two_digit_cache.json'
-    if not os.path.exists(cache_file):
+    cache = load_two_digit_cache()
+    if not cache:
         return False
         
-    with open(cache_file, 'r', encoding='utf-8') as f:
-        cache = json.load(f)
-        
     # Verifica se todos os pares de 00 a 99 existem
     for i in range(10):
         for j in range(10):
@@ -153,49 +87,43 @@ def is_cache_complete():
 
 def save_to_cache(words, search_pair):
     """
-    Salva palavras na cache organizadas pelos seus dois primeiros dígitos
+    Salva palavras na cache organizadas pelos seus dois primeiros dígitos.
+    As entradas novas são acrescentadas ao journal (word_journal.py), que é
+    compactado para two_digit_cache.json de vez em quando.
     """
-    global two_digit_cache, two_digit_cache_mtime
-    cache_file = 'two_digit_cache.json'
+    snapshot = word_store.get_snapshot()
+    existing = snapshot.bucket_words(search_pair)
 
-    # Criar ou carregar cache em memória (evita I/O repetido)
-    cache = load_two_digit_cache()
-    if not isinstance(cache, dict):
-        cache = {}
-
-    # Inicializar entrada para o par buscado se não existir
-    if search_pair not in cache:
-        cache[search_pair] = []
+    if not existing:
         print(f"Novo par adicionado à cache: {search_pair}")
 
-    # Adicionar todas as palavras encontradas
-    for word, _ in words:
-        converted_number = word_to_major_number(word)
-        word_data = {
-            "word": word,
-            "number": converted_number
-        }
-        if not any((isinstance(w, dict) and w.get("word") == word) for w in cache[search_pair]):
-            cache[search_pair].append(word_data)
+    # Adicionar todas as palavras encontradas (conversão em lote)
+    added = []
+    seen = set(existing)
+    words = list(words)
+    numbers = encode_many(word for word, _ in words)
+    for (word, _), converted_number in zip(words, numbers):
+        if word not in seen:
+            seen.add(word)
+            added.append({"word": word, "number": converted_number})
             print(f"✓ Nova palavra adicionada ao cache em {search_pair}: {word} ({converted_number})")
 
-    # Salvar cache atualizado no disco
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, ensure_ascii=False, indent=4)
+    if not added:
+        return
 
-    # Atualizar cache em memória e mtime
-    try:
-        two_digit_cache = cache
-        two_digit_cache_mtime = os.path.getmtime(cache_file)
-    except Exception:
-        pass
+    # Escrever só as entradas novas e publicar o novo snapshot para este processo
+    journal_size = word_journal.append(search_pair, added)
+    word_store.publish(search_pair, added)
+    if journal_size >= word_journal.COMPACT_THRESHOLD:
+        word_journal.compact()
 
 def check_pair_in_cache(pair):
     """
     Verifica se um par específico de dígitos já está na cache
     """
-    cache = load_two_digit_cache()
-    return pair in cache and len(cache.get(pair, [])) > 0  # Retorna True apenas se tiver palavras
+    cached = get_word_index().has_pair(pair)  # Retorna True apenas se tiver palavras
+    metrics.cache_lookup('two_digit_cache', cached)
+    return cached
 
 def find_words_by_number(number, exact_match=True):
     """
@@ -210,41 +138,60 @@ def find_words_by_number(number, exact_match=True):
     # Verificar se este par já está na cache
     if check_pair_in_cache(first_two):
         print(f"Usando cache para {first_two}...")
-        cache = load_two_digit_cache()
-        matching_words = []
-        for word_data in cache.get(first_two, []):
-            if exact_match and word_data.get("number") == number:
-                matching_words.append((word_data.get("word"), ""))
-            elif not exact_match and number.startswith(word_data.get("number", "")):
-                matching_words.append((word_data.get("word"), ""))
-        return matching_words
+        index = get_word_index()
+        if exact_match:
+            return [(word, "") for word in index.exact(number)]
+        return [(word, "") for _, words in index.prefixes_of(number, min_length=2) for word in words]
     
     # Se não estiver na cache, buscar na API e salvar
     print(f"Buscando novas palavras para {first_two}...")
+    words = fetch_pair_words_from_api(first_two)
+    
+    # Salvar resultados na cache
+    if words:
+        save_to_cache(words, first_two)
+    
+    return words
+
+def ensure_pair_cached(pair):
+    """
+    Garante que um par sem cache é procurado (uma vez) na API e guardado.
+    Devolve True se o par tiver palavras na cache.
+    """
+    if check_pair_in_cache(pair):
+        return True
+    # Pares que a API confirmou há pouco não terem palavras não voltam a ser pedidos
+    if negative_cache.known_empty(('pair', pair)):
+        return False
+    words = fetch_pair_words_from_api(pair)
+    if words:
+        save_to_cache(words, pair)
+    if check_pair_in_cache(pair):
+        return True
+    negative_cache.remember_empty(('pair', pair))
+    return False
+
+def fetch_pair_words_from_api(pair):
+    """
+    Busca na API palavras cujo número começa pelo par indicado
+    """
     # Para pares que começam com 7, procurar especificamente combinações com "qu"
-    if first_two.startswith("7"):
-        # Procurar palavras que começam com "qu"
+    if pair.startswith("7"):
+        # Procurar palavras que começam com "qu" (pedidos em paralelo)
         qu_combinations = ["qua", "que", "qui", "quo"]
         found_words = set()
-        for comb in qu_combinations:
-            prefix_results = fetch_words_from_api(comb, "prefix")
+        jobs = [(comb, "prefix") for comb in qu_combinations]
+        for (comb, _), prefix_results in dictionary_api.fetch_many(jobs, fetch=fetch_words_from_api):
             # Filtrar palavras que começam com "qu"
             for word_data in prefix_results:
                 word = word_data.get("word", "")
                 if word and word.lower().startswith("qu"):
                     converted_number = word_to_major_number(word)
-                    if converted_number.startswith(first_two):
+                    if converted_number.startswith(pair):
                         found_words.add((word, comb))
-        words = list(found_words)
-    else:
-        # Código original de busca na API para outros pares
-        words = []  # Aqui vai o código original de busca na API
-    
-    # Salvar resultados na cache
-    if words:
-        save_to_cache(words, first_two)
-    
-    return words
+        return list(found_words)
+    # Código original de busca na API para outros pares
+    return []
 
 def find_best_number_combinations(number):
     """
@@ -271,12 +218,24 @@ def find_best_number_combinations(number):
     else:
         print("\nNenhuma palavra encontrada.")
 
-@lru_cache(maxsize=32)
 def find_single_digit_words(digit):
     """
     Busca palavras que representam um único dígito na API
     """
-    cache_file = 'digit_cache.json'
+    # A versão de digit_cache.json (seguida pelo snapshot, sem stat por chamada) faz parte
+    # da chave da lru_cache: quando o ficheiro muda, as palavras são relidas
+    return _single_digit_words(digit, word_store.get_snapshot().digit_version)
+
+@lru_cache(maxsize=32)
+def _single_digit_words(digit, version):
+    # Backend shards: as palavras do dígito vêm do seu shard, sem ler digit_cache.json inteiro
+    digit_words = getattr(get_word_index(), 'digit_words', None)
+    words = digit_words(digit) if digit_words is not None else None
+    if words is not None:
+        metrics.cache_lookup('digit_cache', True)
+        return [(word, "") for word in words]
+
+    cache_file = word_store.DIGIT_CACHE_FILE
     
     # Carregar ou criar cache
     if os.path.exists(cache_file):
@@ -286,13 +245,15 @@ def find_single_digit_words(digit):
         cache = {}
     
     # Se já temos palavras para este dígito na cache, retornar
+    metrics.cache_lookup('digit_cache', digit in cache)
     if digit in cache:
         return [(word_data["word"], "") for word_data in cache[digit]]
     
     # Buscar na API usando as consoantes do dígito
     consonant_options = major_system_mapping[digit]
     found_words = set()
-    searched_combinations = set()
+    searched_combinations = []
+    qu_queries = set()
     
     # Vogais simples e compostas
     vowels = ["a", "e", "i", "o", "u"]
@@ -306,58 +267,38 @@ def find_single_digit_words(digit):
     
     # Para o dígito 7 (que inclui "q"), procurar especificamente combinações com "qu"
     if digit == "7":
-        # Procurar palavras que começam com "qu"
-        qu_combinations = ["qua", "que", "qui", "quo"]
-        for comb in qu_combinations:
-            if comb not in searched_combinations:
-                searched_combinations.add(comb)
-                prefix_results = fetch_words_from_api(comb, "prefix")
-                # Filtrar palavras que começam com "qu"
-                for word_data in prefix_results:
-                    word = word_data.get("word", "")
-                    if word and word.lower().startswith("qu") and word_to_major_number(word) == digit:
-                        found_words.add((word, comb))
+        qu_queries.update(["qua", "que", "qui", "quo"])
+        searched_combinations.extend(["qua", "que", "qui", "quo"])
     
     for consonant in consonant_options:
         # Padrão CV (Consoante + Vogal)
         for vowel in vowels + vowel_combinations:
-            query = f"{consonant}{vowel}"
-            if query not in searched_combinations:
-                searched_combinations.add(query)
-                prefix_results = fetch_words_from_api(query, "prefix")
-                infix_results = fetch_words_from_api(query, "infix")
-                
-                all_results = {word_data.get("word", "") for word_data in prefix_results + infix_results}
-                for word in all_results:
-                    if word and word_to_major_number(word) == digit:
-                        found_words.add((word, query))
-        
+            searched_combinations.append(f"{consonant}{vowel}")
         # Padrão VC (Vogal + Consoante)
         for vowel in vowels:
-            query = f"{vowel}{consonant}"
-            if query not in searched_combinations:
-                searched_combinations.add(query)
-                prefix_results = fetch_words_from_api(query, "prefix")
-                infix_results = fetch_words_from_api(query, "infix")
-                
-                all_results = {word_data.get("word", "") for word_data in prefix_results + infix_results}
-                for word in all_results:
-                    if word and word_to_major_number(word) == digit:
-                        found_words.add((word, query))
-        
+            searched_combinations.append(f"{vowel}{consonant}")
         # Padrão VCV (Vogal + Consoante + Vogal)
         for v1 in vowels:
             for v2 in vowels:
-                query = f"{v1}{consonant}{v2}"
-                if query not in searched_combinations:
-                    searched_combinations.add(query)
-                    prefix_results = fetch_words_from_api(query, "prefix")
-                    infix_results = fetch_words_from_api(query, "infix")
-                    
-                    all_results = {word_data.get("word", "") for word_data in prefix_results + infix_results}
-                    for word in all_results:
-                        if word and word_to_major_number(word) == digit:
-                            found_words.add((word, query))
+                searched_combinations.append(f"{v1}{consonant}{v2}")
+    
+    # Cada combinação é procurada uma vez: "qu" só por prefixo, as restantes por prefixo e infixo
+    jobs = []
+    for query in dict.fromkeys(searched_combinations):
+        jobs.append((query, "prefix"))
+        if query not in qu_queries:
+            jobs.append((query, "infix"))
+    
+    # Todos os pedidos correm em paralelo; os resultados são filtrados à medida que chegam
+    for (query, _), results in dictionary_api.fetch_many(jobs, fetch=fetch_words_from_api):
+        for word_data in results:
+            word = word_data.get("word", "")
+            if not word or word_to_major_number(word) != digit:
+                continue
+            # Filtrar palavras que começam com "qu"
+            if query in qu_queries and not word.lower().startswith("qu"):
+                continue
+            found_words.add((word, query))
     
     # Salvar palavras encontradas na cache
     words = list(found_words)
@@ -365,88 +306,43 @@ def find_single_digit_words(digit):
         cache[digit] = [{"word": word, "number": digit} for word, _ in words]
         with open(cache_file, 'w', encoding='utf-8') as f:
             json.dump(cache, f, ensure_ascii=False, indent=4)
+        word_store.refresh_digits()
     
     return words
 
-def find_pairs_combinations(number, verbose=True):
-    best_coverage = {}
-    remaining_number = number
-    
+find_single_digit_words.cache_info = _single_digit_words.cache_info
+
+def greedy_segmenter():
+    """
+    Segmentador incremental (ver segmentation.IncrementalSegmenter) com o índice atual,
+    as palavras de um dígito e a procura na API dos pares ainda sem cache.
+    """
+    return IncrementalSegmenter(get_word_index, find_single_digit_words, ensure_pair_cached)
+
+def find_pairs_combinations(number, verbose=True, segmenter=None):
+    """
+    Divisão gulosa de `number`: em cada posição a palavra com o prefixo mais longo
+    (2+ dígitos), senão palavras de um dígito. Com `segmenter` (p.ex. o da interface
+    interativa) os passos do prefixo já segmentado são reutilizados.
+    """
     if verbose:
         print(f"\nBuscando palavras para {number}...")
-    
-    while remaining_number:
-        best_words = []
-        best_length = 0
-        
-        # Tentar palavras de dois ou mais dígitos primeiro
-        if len(remaining_number) >= 2:
-            initial_pair = remaining_number[:2]
-            
-            # Buscar palavras (da cache ou API)
-            if check_pair_in_cache(initial_pair):
-                cache = load_two_digit_cache()
-                words = [(word_data.get("word"), "") for word_data in cache.get(initial_pair, [])]
-            else:
-                # Para pares que começam com 7, procurar especificamente combinações com "qu"
-                if initial_pair.startswith("7"):
-                    # Procurar palavras que começam com "qu"
-                    qu_combinations = ["qua", "que", "qui", "quo"]
-                    found_words = set()
-                    for comb in qu_combinations:
-                        prefix_results = fetch_words_from_api(comb, "prefix")
-                        # Filtrar palavras que começam com "qu"
-                        for word_data in prefix_results:
-                            word = word_data.get("word", "")
-                            if word and word.lower().startswith("qu"):
-                                converted_number = word_to_major_number(word)
-                                if converted_number.startswith(initial_pair):
-                                    found_words.add((word, comb))
-                    words = list(found_words)
-                else:
-                    # Código existente de busca na API
-                    words = []
-                if words:
-                    save_to_cache(words, initial_pair)
-            
-            # Processar palavras encontradas para o par
-            for word, _ in words:
-                converted_number = word_to_major_number(word)
-                if remaining_number.startswith(converted_number):
-                    digits = len(converted_number)
-                    if digits > best_length:
-                        best_length = digits
-                        best_words = [(word, "")]
-                    elif digits == best_length:
-                        best_words.append((word, ""))
-        
-        # Se não encontrou palavras para o par, tentar dígito único
-        if not best_words and len(remaining_number) >= 1:
-            single_digit = remaining_number[0]
-            single_digit_words = find_single_digit_words(single_digit)
-            
-            if single_digit_words:
-                if verbose:
-                    print(f"Encontrada(s) palavra(s) para o dígito {single_digit}")
-                best_words = single_digit_words
-                best_length = 1
-        
-        if best_words:
-            covered_part = remaining_number[:best_length]
-            best_coverage[covered_part] = best_words
-            remaining_number = remaining_number[best_length:]
-        else:
-            remaining_number = remaining_number[1:]
-            if not remaining_number:
-                break
+
+    segmenter = segmenter or greedy_segmenter()
+    segmenter.set(number)
+    best_coverage = segmenter.coverage()
+    if verbose:
+        for sequence in best_coverage:
+            if len(sequence) == 1:
+                print(f"Encontrada(s) palavra(s) para o dígito {sequence}")
     
     # Mostrar resultados
     if best_coverage:
         if verbose:
             print("\nPalavras encontradas:")
-        for sequence, words in best_coverage.items():
-            word_list = [word[0] for word in words]
-            if verbose:
+        if verbose:
+            for sequence, words in best_coverage.items():
+                word_list = [word[0] for word in words]
                 print(f"• {sequence}: {word_list}")
     elif verbose:
         print("\nNenhuma palavra encontrada.")
@@ -458,13 +354,12 @@ def show_cache_status():
     Mostra informações sobre o estado atual da cache
     """
     if os.path.exists('two_digit_cache.json'):
-        with open('two_digit_cache.json', 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-            total_pairs = len(cache)
-            total_words = sum(len(words) for words in cache.values())
-            print(f"\nStatus da cache:")
-            print(f"• Pares de dígitos salvos: {total_pairs}")
-            print(f"• Total de palavras: {total_words}")
+        cache = load_two_digit_cache()
+        total_pairs = len(cache)
+        total_words = sum(len(words) for words in cache.values())
+        print(f"\nStatus da cache:")
+        print(f"• Pares de dígitos salvos: {total_pairs}")
+        print(f"• Total de palavras: {total_words}")
     else:
         print("\nCache ainda não existe.")
 
@@ -493,6 +388,7 @@ def main():
     show_cache_status()
     
     current_number = ""
+    segmenter = greedy_segmenter()
     
     while True:
         try:
@@ -540,7 +436,8 @@ def main():
                 termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
         
         # Update display after each input
-        suggestions = find_pairs_combinations(current_number, verbose=False) if current_number else {}
+        # O segmentador só refaz os últimos dígitos a cada tecla
+        suggestions = find_pairs_combinations(current_number, verbose=False, segmenter=segmenter) if current_number else {}
         display_interface(current_number, suggestions)
 
     print("\033[H\033[J")  # Clear screen at exit
@@ -0,0 +1,72 @@
+import re
+
+# Mapeamento do Sistema Fonético Major
+major_system_mapping = {
+    "0": ["z", "s", "ss", "ç", "c"],
+    "1": ["t", "d"],
+    "2": ["n", "nh"],
+    "3": ["m"],
+    "4": ["r", "rr"],  # "rr" é agora parte do algarismo 4
+    "5": ["l"],
+    "6": ["j", "sc", "x", "ch", "g", "ge", "gi"],
+    "7": ["q", "c", "g"],  # "g" será tratado separadamente
+    "8": ["f", "v"],
+    "9": ["p", "b"]
+}
+
+# Inverso do mapeamento
+inverse_mapping = {v: k for k, vs in major_system_mapping.items() for v in vs}
+
+# Regras de dígrafos, pela mesma ordem de prioridade do algoritmo original
+# (o "e"/"i"/"a"/"o"/"u" que segue o "c"/"g" é consumido com a consoante)
+_DIGRAPH_DIGITS = {
+    "ss": "0",
+    "ll": "5",
+    "rr": "4",
+    "ch": "6",
+    "ce": "0", "ci": "0",
+    "ge": "6", "gi": "6",
+    "ga": "7", "go": "7", "gu": "7",
+}
+
+# Tabela de tokens -> dígito: dígrafos + letras simples do mapeamento
+_TOKEN_DIGITS = dict(_DIGRAPH_DIGITS)
+_TOKEN_DIGITS.update({k: v for k, v in inverse_mapping.items() if len(k) == 1})
+
+# Um único padrão compilado: a alternância tenta os dígrafos antes das letras
+# simples em cada posição; caracteres fora do mapeamento são simplesmente saltados.
+_TOKEN_RE = re.compile(
+    "ss|ll|rr|ch|c[ei]|g[ei]|g[aou]|["
+    + "".join(sorted(k for k in _TOKEN_DIGITS if len(k) == 1))
+    + "]"
+)
+
+
+def encode_word(word):
+    """
+    Converte uma palavra no número do Sistema Fonético Major numa única passagem.
+    Produz exatamente o mesmo resultado que o algoritmo caractere-a-caractere original.
+    """
+    digits = _TOKEN_DIGITS
+    return "".join([digits[t] for t in _TOKEN_RE.findall(word.lower())])
+
+
+def encode_many(words):
+    """
+    Converte uma sequência de palavras de uma só vez (ingestão, varrimentos completos).
+    Devolve uma lista de números pela mesma ordem das palavras; palavras repetidas
+    são convertidas apenas uma vez.
+    """
+    digits = _TOKEN_DIGITS
+    findall = _TOKEN_RE.findall
+    join = "".join
+    seen = {}
+    out = []
+    append = out.append
+    for word in words:
+        number = seen.get(word)
+        if number is None:
+            number = join([digits[t] for t in findall(word.lower())])
+            seen[word] = number
+        append(number)
+    return out
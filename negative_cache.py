@@ -0,0 +1,131 @@
+import math
+import os
+
+from major_encoder import encode_many
+from result_cache import ResultCache
+
+# Taxa de falsos positivos do filtro de Bloom sobre os números com palavras
+BLOOM_ERROR_RATE = float(os.environ.get('MENMONICA_BLOOM_ERROR', '0.01'))
+# Consultas confirmadas sem palavras (por worker) e validade em segundos; 0 desativa
+NEGATIVE_ENTRIES = int(os.environ.get('MENMONICA_NEGATIVE_CACHE', '4096'))
+NEGATIVE_TTL = float(os.environ.get('MENMONICA_NEGATIVE_TTL', '600'))
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom em memória: `key in bloom` é False só se a chave nunca foi
+    acrescentada. Usa hash() do Python (estável dentro do processo e dos workers
+    criados por fork), por isso nunca é guardado em disco.
+    """
+
+    __slots__ = ('_bits', '_size', '_hashes')
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._size = size
+        self._hashes = max(1, round(size / capacity * math.log(2)))
+        self._bits = bytearray((size + 7) // 8)
+
+    @classmethod
+    def from_keys(cls, keys, error_rate=BLOOM_ERROR_RATE):
+        keys = list(keys)
+        bloom = cls(len(keys), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _probes(self, key):
+        # Duplo hashing (Kirsch–Mitzenmacher) a partir de um único hash de 64 bits
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return h & 0xFFFFFFFF, (h >> 32) | 1
+
+    def add(self, key):
+        h1, h2 = self._probes(key)
+        bits, size = self._bits, self._size
+        for i in range(self._hashes):
+            pos = (h1 + i * h2) % size
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        h1, h2 = self._probes(key)
+        bits, size = self._bits, self._size
+        # Metade dos bits fica a 0: uma chave ausente costuma falhar logo na primeira sonda
+        for i in range(self._hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def copy(self):
+        bloom = BloomFilter.__new__(BloomFilter)
+        bloom._bits = bytearray(self._bits)
+        bloom._size = self._size
+        bloom._hashes = self._hashes
+        return bloom
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+class BloomIndex:
+    """
+    Envolve um índice cujas consultas são caras (mmap, SQLite) e responde logo "sem
+    palavras" aos números que o filtro de Bloom exclui, sem tocar no índice.
+    Os falsos positivos (~BLOOM_ERROR_RATE) seguem para o índice, que tem a última palavra.
+    """
+
+    def __init__(self, index, bloom=None):
+        self.index = index
+        self.bloom = bloom if bloom is not None else BloomFilter.from_keys(index.iter_numbers())
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def extended(self, index, words):
+        """BloomIndex sobre `index` (este estendido com `words`): cópia do filtro mais os números novos."""
+        bloom = self.bloom.copy()
+        for number in encode_many(words):
+            if number:
+                bloom.add(number)
+        return BloomIndex(index, bloom)
+
+    def exact(self, number):
+        if number not in self.bloom:
+            return ()
+        return self.index.exact(number)
+
+    def prefixes_of(self, number, min_length=1):
+        # Só os prefixos que passam o filtro chegam ao índice, um de cada vez
+        bloom = self.bloom
+        exact = self.index.exact
+        found = []
+        for k in range(max(min_length, 1), min(len(number), self.index.max_length) + 1):
+            prefix = number[:k]
+            if prefix in bloom:
+                words = exact(prefix)
+                if words:
+                    found.append((prefix, words))
+        return found
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+
+# Consultas de recurso (API, divisão gulosa) que já se confirmou não terem palavras
+_empty = ResultCache(NEGATIVE_ENTRIES, NEGATIVE_TTL)
+
+
+def known_empty(key):
+    """True se `key` (p.ex. ('block', tag, número)) foi confirmada sem palavras há pouco."""
+    return _empty.enabled and _empty.get(key) is not None
+
+
+def remember_empty(key):
+    _empty.put(key, True)
+
+
+def forget_empty():
+    _empty.clear()
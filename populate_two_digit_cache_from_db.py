@@ -3,10 +3,15 @@ import json
 import os
 import re
 import sqlite3
+import time
+from collections import deque
+from multiprocessing import Pool
 from typing import Optional, Tuple, List, Dict, Set
 
-# Reuse the exact conversion logic already used by the app
-from main import word_to_major_number
+# Reuse the exact conversion logic already used by the app (batch entry point)
+from major_encoder import encode_many
+import word_journal
+from word_index import WORD_TABLE
 
 
 DEFAULT_DB_PATH = "dictionary.db"
@@ -25,7 +30,8 @@ def detect_word_source(conn: sqlite3.Connection) -> Optional[Tuple[str, str]]:
 
     # 1) List tables
     cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [r[0] for r in cur.fetchall()]
+    # The derived word_numbers table (build_word_index.py --sqlite) is not a word source
+    tables = [r[0] for r in cur.fetchall() if r[0] != WORD_TABLE]
 
     # Prefer tables whose name hints at dictionary/words
     preferred_order: List[str] = sorted(
@@ -91,6 +97,9 @@ def detect_word_source(conn: sqlite3.Connection) -> Optional[Tuple[str, str]]:
 
 
 def load_cache(cache_path: str) -> Dict[str, List[Dict[str, str]]]:
+    if cache_path == word_journal.CACHE_FILE:
+        # Include entries the app appended to the journal but has not compacted yet
+        return word_journal.load_cache(cache_path)
     if os.path.exists(cache_path):
         try:
             with open(cache_path, "r", encoding="utf-8") as f:
@@ -102,11 +111,25 @@ def load_cache(cache_path: str) -> Dict[str, List[Dict[str, str]]]:
     return {}
 
 
-def save_cache(cache_path: str, data: Dict[str, List[Dict[str, str]]]) -> None:
+def merge_into_cache(cache_path: str, new_entries: Dict[str, List[Dict[str, str]]]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Merge new_entries into the cache as it is on disk now, not as it was loaded before
+    the scan: words the app appended or compacted meanwhile are kept. Returns the merged cache.
+    """
+    def merge(cache: Dict[str, List[Dict[str, str]]]) -> Dict[str, List[Dict[str, str]]]:
+        for pair, entries in new_entries.items():
+            cache[pair] = dedupe_and_sort(cache.get(pair, []) + entries)
+        return cache
+
+    if cache_path == word_journal.CACHE_FILE:
+        # Read-merge-write under the cache lock, folding in the journal
+        return word_journal.update_cache(merge, cache_path)
+    cache = merge(load_cache(cache_path))
     tmp_path = cache_path + ".tmp"
     with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+        json.dump(cache, f, ensure_ascii=False, indent=4)
     os.replace(tmp_path, cache_path)
+    return cache
 
 
 def should_include_number(number: str, pair: str, mode: str) -> bool:
@@ -125,6 +148,138 @@ def normalize_word(w: str) -> Optional[str]:
     return s
 
 
+def dedupe_and_sort(entries: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Keep entries unique by word text (case-insensitive) and sorted by word lower."""
+    seen: Set[str] = set()
+    deduped: List[Dict[str, str]] = []
+    for e in entries:
+        if not isinstance(e, dict):
+            continue
+        w = (e.get("word") or "").strip()
+        n = (e.get("number") or "").strip()
+        if not w or not n:
+            continue
+        lw = w.lower()
+        if lw in seen:
+            continue
+        seen.add(lw)
+        deduped.append({"word": w, "number": n})
+    return sorted(deduped, key=lambda x: x["word"].lower())
+
+
+def encode_chunk(words: List[str]) -> List[str]:
+    """Worker entry point: Major numbers for one fetchmany batch."""
+    return encode_many(words)
+
+
+def iter_encoded_batches(cur: sqlite3.Cursor, batch_size: int, workers: int):
+    """
+    Stream the query result in fetchmany batches and yield (words, numbers) per batch,
+    in table order. With workers > 1 batches are encoded in a process pool, keeping at
+    most 2 * workers batches in flight so memory stays bounded on huge tables.
+    """
+    def batches():
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield len(rows), [w for w in (normalize_word(row["w"]) for row in rows) if w]
+
+    if workers <= 1:
+        for scanned, words in batches():
+            yield scanned, words, encode_many(words)
+        return
+
+    with Pool(processes=workers) as pool:
+        pending = deque()
+        for scanned, words in batches():
+            pending.append((scanned, words, pool.apply_async(encode_chunk, (words,))))
+            if len(pending) >= 2 * workers:
+                scanned, words, result = pending.popleft()
+                yield scanned, words, result.get()
+        while pending:
+            scanned, words, result = pending.popleft()
+            yield scanned, words, result.get()
+
+
+def populate_all_pairs(args, conn: sqlite3.Connection, table: str, column: str) -> None:
+    """
+    Rebuild every pair 00-99 in one pass: stream the table once, encode in parallel,
+    route each word to the bucket of its first two digits and write the cache once.
+    """
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM '{table}'").fetchone()[0]
+    except sqlite3.DatabaseError:
+        total = 0
+    if args.limit and args.limit > 0:
+        total = min(total, args.limit) if total else args.limit
+
+    sql = f"SELECT {column} AS w FROM '{table}'"
+    if args.limit and args.limit > 0:
+        sql += f" LIMIT {args.limit}"
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+    except sqlite3.DatabaseError as e:
+        print(f"ERROR executing query: {e}")
+        raise SystemExit(2)
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Querying words from DB (single pass, {workers} worker(s), batches of {args.batch_size})...")
+
+    cache = load_cache(args.cache)
+    existing: Dict[str, Set[str]] = {}
+    new_entries: Dict[str, List[Dict[str, str]]] = {}
+    counts: Dict[str, int] = {}
+    sample_print: List[Tuple[str, str]] = []
+
+    scanned = 0
+    started = last_report = time.perf_counter()
+    for batch_scanned, words, numbers in iter_encoded_batches(cur, args.batch_size, workers):
+        scanned += batch_scanned
+        for w, number in zip(words, numbers):
+            if len(number) < 2 or (args.mode == "exact" and len(number) != 2):
+                continue
+            pair = number[:2]
+            counts[pair] = counts.get(pair, 0) + 1
+            if args.print_count and len(sample_print) < args.print_count:
+                sample_print.append((w, number))
+            seen = existing.get(pair)
+            if seen is None:
+                seen = existing[pair] = {
+                    (e.get("word") or "").strip().lower() for e in cache.get(pair, []) if isinstance(e, dict)
+                }
+            lw = w.lower()
+            if lw not in seen:
+                seen.add(lw)
+                new_entries.setdefault(pair, []).append({"word": w, "number": number})
+
+        now = time.perf_counter()
+        if now - last_report >= args.progress_every:
+            last_report = now
+            rate = scanned / (now - started)
+            done = f"{scanned}/{total} ({100.0 * scanned / total:.1f}%)" if total else f"{scanned}"
+            print(f"  scanned {done} rows, {rate:,.0f} rows/s")
+
+    elapsed = time.perf_counter() - started
+    added = sum(len(v) for v in new_entries.values())
+    print(f"Scanned rows: {scanned} in {elapsed:.2f}s ({scanned / elapsed if elapsed else 0:,.0f} rows/s)")
+    print(f"Matching candidates (mode={args.mode}): {sum(counts.values())} across {len(counts)} pairs")
+    print(f"New unique entries to add: {added}")
+    for w, number in sample_print:
+        print(f"  {w} -> {number}")
+
+    if args.dry_run:
+        print("Dry-run: not writing to cache.")
+        return
+    if not added:
+        print("No new entries to add.")
+        return
+
+    merge_into_cache(args.cache, new_entries)
+    print(f"Wrote {added} new entries into {len(new_entries)} pairs.")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Populate/repair two_digit_cache.json with words from dictionary.db for a specific two-digit pair."
@@ -132,6 +287,13 @@ def main():
     parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to SQLite DB file (default: dictionary.db)")
     parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path to two_digit_cache.json (default: two_digit_cache.json)")
     parser.add_argument("--pair", default="46", help="Two-digit pair to (re)populate, e.g. 46")
+    parser.add_argument("--all", dest="all_pairs", action="store_true",
+                        help="Populate every pair 00-99 in a single pass over the table (ignores --pair)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes used to encode words with --all (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per fetchmany batch (default: 5000)")
+    parser.add_argument("--progress-every", type=float, default=2.0,
+                        help="Seconds between progress reports with --all (default: 2)")
     parser.add_argument("--mode", choices=["startswith", "exact"], default="startswith",
                         help="Filter mode: 'startswith' includes numbers beginning with the pair; 'exact' only exact two-digit matches")
     parser.add_argument("--table", help="Optional table name override")
@@ -142,7 +304,7 @@ def main():
                         help="Print up to N matching words with their computed numbers (for inspection). 0 = no print")
     args = parser.parse_args()
 
-    if not re.fullmatch(r"\d{2}", args.pair):
+    if not args.all_pairs and not re.fullmatch(r"\d{2}", args.pair):
         print(f"ERROR: --pair must be exactly two digits, got '{args.pair}'")
         raise SystemExit(2)
 
@@ -169,6 +331,10 @@ def main():
     else:
         print(f"Using explicit source: table='{table}', column='{column}'")
 
+    if args.all_pairs:
+        populate_all_pairs(args, conn, table, column)
+        return
+
     # Stream words
     sql = f"SELECT {column} AS w FROM '{table}'"
     if args.limit and args.limit > 0:
@@ -194,22 +360,12 @@ def main():
     sample_print: List[Tuple[str, str]] = []
 
     while True:
-        rows = cur.fetchmany(5000)
+        rows = cur.fetchmany(args.batch_size)
         if not rows:
             break
-        for row in rows:
-            scanned += 1
-            w_raw = row["w"]
-            w = normalize_word(w_raw)
-            if not w:
-                continue
-
-            try:
-                number = word_to_major_number(w)
-            except Exception:
-                # Ignore words that cause issues in mapping
-                continue
-
+        scanned += len(rows)
+        batch = [w for w in (normalize_word(row["w"]) for row in rows) if w]
+        for w, number in zip(batch, encode_many(batch)):
             if not number:
                 continue
 
@@ -235,26 +391,8 @@ def main():
         return
 
     if new_entries:
-        cache[args.pair].extend(new_entries)
-        # Optional: keep entries unique and sorted by word lower
-        # Uniqueness by word text
-        seen: Set[str] = set()
-        deduped: List[Dict[str, str]] = []
-        for e in cache[args.pair]:
-            if not isinstance(e, dict):
-                continue
-            w = (e.get("word") or "").strip()
-            n = (e.get("number") or "").strip()
-            if not w or not n:
-                continue
-            lw = w.lower()
-            if lw in seen:
-                continue
-            seen.add(lw)
-            deduped.append({"word": w, "number": n})
-        cache[args.pair] = sorted(deduped, key=lambda x: x["word"].lower())
-
-        save_cache(args.cache, cache)
+        # Keep entries unique and sorted by word lower
+        cache = merge_into_cache(args.cache, {args.pair: new_entries})
         print(f"Wrote {len(new_entries)} new entries. Total now under '{args.pair}': {len(cache[args.pair])}")
     else:
         print("No new entries to add.")
@@ -0,0 +1,175 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# Perfil de um pedido a pedido: ativo com MENMONICA_PROFILING=1 e o cabeçalho
+# X-Menmonica-Profile igual a MENMONICA_PROFILE_TOKEN (ou qualquer valor, sem token)
+ENABLED = os.environ.get('MENMONICA_PROFILING', '').lower() in ('1', 'true', 'yes', 'on')
+TOKEN = os.environ.get('MENMONICA_PROFILE_TOKEN', '')
+PROFILE_HEADER = 'X-Menmonica-Profile'
+# Onde guardar os perfis (.prof para pstats/snakeviz) e as pilhas amostradas
+PROFILE_DIR = os.environ.get('MENMONICA_PROFILE_DIR', 'profiles')
+TOP_FUNCTIONS = int(os.environ.get('MENMONICA_PROFILE_TOP', '25'))
+# Amostragem contínua de pilhas (formato "collapsed" para flamegraph.pl / speedscope)
+SAMPLING = os.environ.get('MENMONICA_PROFILE_SAMPLING', '').lower() in ('1', 'true', 'yes', 'on')
+SAMPLE_INTERVAL = float(os.environ.get('MENMONICA_PROFILE_SAMPLE_MS', '10')) / 1000.0
+FLUSH_INTERVAL = float(os.environ.get('MENMONICA_PROFILE_FLUSH_S', '30'))
+
+# Só um cProfile pode estar ativo de cada vez por processo
+_profile_lock = threading.Lock()
+
+
+def requested(header_value):
+    """True se o pedido pediu (e pode pedir) um perfil."""
+    if not ENABLED or not header_value:
+        return False
+    return not TOKEN or header_value == TOKEN
+
+
+def _function_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # funções built-in, p.ex. <method 'sort' of 'list' objects>
+    return f'{os.path.basename(filename)}:{line}({name})'
+
+
+def top_functions(profiler, limit=TOP_FUNCTIONS):
+    """
+    As `limit` funções com maior tempo cumulativo, com quem as chamou, para seguir
+    cadeias como words_for_block -> find_pairs_combinations -> find_single_digit_words.
+    """
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    top = []
+    for func, (primitive_calls, calls, tottime, cumtime, callers) in rows:
+        top.append({
+            'function': _function_name(func),
+            'calls': calls,
+            'primitiveCalls': primitive_calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+            'callers': sorted(_function_name(c) for c in callers),
+        })
+    return top
+
+
+def save(profiler, label):
+    """Guarda o perfil em PROFILE_DIR e devolve o caminho (None em caso de erro)."""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe = ''.join(ch if ch.isalnum() else '_' for ch in label)
+        path = os.path.join(PROFILE_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{safe}.prof')
+        profiler.dump_stats(path)
+        return path
+    except OSError as e:
+        print(f"Não foi possível guardar o perfil: {e}")
+        return None
+
+
+def profile_call(label, fn, *args, **kwargs):
+    """
+    Executa fn sob cProfile. Devolve (resultado, relatório) — o relatório é None se
+    outro pedido estiver a ser perfilado neste momento (o pedido corre normalmente).
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return fn(*args, **kwargs), None
+    try:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        result = profiler.runcall(fn, *args, **kwargs)
+        elapsed = time.perf_counter() - started
+    finally:
+        _profile_lock.release()
+    report = {
+        'label': label,
+        'wallTime': round(elapsed, 6),
+        'top': top_functions(profiler),
+        'file': save(profiler, label),
+    }
+    return result, report
+
+
+class StackSampler:
+    """
+    Amostrador de baixo custo: a cada `interval` segundos regista a pilha de cada
+    thread (sys._current_frames) e acumula contagens por pilha. Periodicamente
+    reescreve `path` no formato "collapsed" (frame;frame;... contagem).
+    """
+
+    def __init__(self, path, interval=SAMPLE_INTERVAL, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def flush(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for stack, count in self.counts.most_common():
+                    f.write(f'{stack} {count}\n')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Não foi possível escrever as pilhas amostradas: {e}")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+
+_sampler = None
+_sampler_pid = None
+_sampler_lock = threading.Lock()
+
+
+def ensure_sampler():
+    """
+    Arranca (uma vez por processo) o amostrador contínuo se MENMONICA_PROFILE_SAMPLING
+    estiver ativo; cada worker escreve o seu próprio ficheiro stacks-<pid>.folded.
+    """
+    global _sampler, _sampler_pid
+    if not SAMPLING or _sampler_pid == os.getpid():
+        return _sampler
+    with _sampler_lock:
+        if _sampler_pid != os.getpid():
+            path = os.path.join(PROFILE_DIR, f'stacks-{os.getpid()}.folded')
+            _sampler = StackSampler(path).start()
+            _sampler_pid = os.getpid()
+    return _sampler
@@ -0,0 +1,132 @@
+import heapq
+import math
+import os
+import re
+import threading
+
+# Tabela de frequências local: uma palavra por linha, "palavra<espaço ou tab>contagem"
+# (linhas começadas por # são ignoradas). Sem ficheiro, só contam comprimento e penalizações.
+FREQUENCY_FILE = os.environ.get('MENMONICA_WORD_FREQ', 'word_frequencies.txt')
+
+# Pesos do modelo de pontuação (pontuação de uma frase = soma das pontuações das palavras)
+FREQUENCY_WEIGHT = 1.0
+IDEAL_LENGTH = (4, 8)
+LENGTH_PENALTY = 0.5      # por letra fora de IDEAL_LENGTH
+COMPOUND_PENALTY = 3.0    # palavras com espaço ou hífen
+PUNCTUATION_PENALTY = 4.0  # apóstrofos, pontos, dígitos, ...
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s-]|\d|_")
+
+
+class FrequencyTable:
+    """Contagens por palavra (em minúsculas) e pontuações já calculadas."""
+
+    def __init__(self, counts=None, version=None):
+        self.counts = counts or {}
+        self.version = version
+        self._scores = {}
+
+    def score(self, word):
+        s = self._scores.get(word)
+        if s is None:
+            s = self._scores[word] = score_word(word, self.counts)
+        return s
+
+
+def score_word(word, counts):
+    """
+    Pontuação de memorabilidade de uma palavra: frequência (log), comprimento próximo
+    de IDEAL_LENGTH e penalizações para compostas e pontuação.
+    """
+    lw = word.strip().lower()
+    score = FREQUENCY_WEIGHT * math.log1p(counts.get(lw, 0))
+    letters = sum(1 for ch in lw if ch.isalpha())
+    low, high = IDEAL_LENGTH
+    if letters < low:
+        score -= LENGTH_PENALTY * (low - letters)
+    elif letters > high:
+        score -= LENGTH_PENALTY * (letters - high)
+    if ' ' in lw or '-' in lw:
+        score -= COMPOUND_PENALTY
+    if _PUNCTUATION_RE.search(lw):
+        score -= PUNCTUATION_PENALTY
+    return score
+
+
+def read_frequencies(path):
+    counts = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.rsplit(None, 1)
+            if len(parts) != 2:
+                continue
+            try:
+                count = float(parts[1])
+            except ValueError:
+                continue
+            word = parts[0].strip().lower()
+            counts[word] = max(count, counts.get(word, 0))
+    return counts
+
+
+_table = FrequencyTable()
+_lock = threading.Lock()
+
+
+def get_frequency_table():
+    """Tabela de FREQUENCY_FILE, recarregada apenas quando o ficheiro muda."""
+    global _table
+    try:
+        version = os.stat(FREQUENCY_FILE).st_mtime_ns
+    except OSError:
+        version = None
+    table = _table
+    if table.version != version:
+        with _lock:
+            table = _table
+            if table.version != version:
+                counts = {}
+                if version is not None:
+                    try:
+                        counts = read_frequencies(FREQUENCY_FILE)
+                    except OSError as e:
+                        print(f"Tabela de frequências ignorada ({FREQUENCY_FILE}): {e}")
+                table = _table = FrequencyTable(counts, version)
+    return table
+
+
+def top_k_combinations(word_lists, k, score=None):
+    """
+    As k combinações (uma palavra por lista) com maior soma de pontuações, por ordem
+    decrescente, sem materializar o produto cartesiano.
+
+    Cada lista é reduzida às suas k melhores palavras (heapq.nlargest) e a procura
+    best-first parte da combinação de topo; cada estado só gera sucessores nas
+    posições >= à última incrementada, pelo que nenhum estado é gerado duas vezes.
+    Custo: O(n log k) por lista + O(k * partições * log k) na procura.
+    Devolve [(pontuação, [palavras])].
+    """
+    if not word_lists or k <= 0 or not all(word_lists):
+        return []
+    score = score or get_frequency_table().score
+    ranked = []
+    for words in word_lists:
+        best = heapq.nlargest(k, ((score(w), i, w) for i, w in enumerate(words)), key=lambda t: (t[0], -t[1]))
+        ranked.append([(s, w) for s, _, w in best])
+
+    top = sum(r[0][0] for r in ranked)
+    start = (0,) * len(ranked)
+    heap = [(-top, start, 0)]
+    results = []
+    while heap and len(results) < k:
+        neg, idx, last = heapq.heappop(heap)
+        results.append((-neg, [ranked[j][i][1] for j, i in enumerate(idx)]))
+        for j in range(last, len(ranked)):
+            i = idx[j] + 1
+            if i < len(ranked[j]):
+                child = idx[:j] + (i,) + idx[j + 1:]
+                heapq.heappush(heap, (neg + ranked[j][idx[j]][0] - ranked[j][i][0], child, j))
+    return results
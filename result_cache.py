@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Respostas de /api/convert guardadas por processo (0 desativa) e validade em segundos
+MAX_ENTRIES = int(os.environ.get('MENMONICA_RESULT_CACHE', '1024'))
+TTL = float(os.environ.get('MENMONICA_RESULT_CACHE_TTL', '600'))
+
+
+def result_key(request, data_tag):
+    """
+    Chave (e ETag) de uma resposta: hash do pedido normalizado mais a tag dos dados
+    de palavras. Quando os dados mudam a tag muda, e as entradas antigas deixam de
+    ser encontradas (saem por LRU/TTL).
+    """
+    raw = json.dumps([data_tag, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """LRU limitada a `max_entries` com expiração por `ttl`, segura entre threads."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if now - item[1] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
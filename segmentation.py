@@ -0,0 +1,306 @@
+import os
+
+
+def build_span_table(number, index, single_digit_words=None):
+    """
+    Pré-calcula a tabela "que sub-sequências têm palavras":
+    table[i] = {j: palavras} para cada fim j tal que number[i:j] tem palavras.
+
+    - index: WordIndex (ou compatível) usado para segmentos de 2+ dígitos
+    - single_digit_words: função opcional dígito -> palavras para segmentos de 1 dígito
+    """
+    n = len(number)
+    window = max(index.max_length, 2)
+    digit_words = {}
+    table = []
+    for i in range(n):
+        spans = {}
+        if single_digit_words is not None:
+            d = number[i]
+            if d not in digit_words:
+                digit_words[d] = tuple(single_digit_words(d) or ())
+            if digit_words[d]:
+                spans[i + 1] = digit_words[d]
+        for prefix, words in index.prefixes_of(number[i:i + window], min_length=2):
+            spans[i + len(prefix)] = words
+        table.append(spans)
+    return table
+
+
+def best_split(table):
+    """
+    Programação dinâmica (do fim para o início) sobre a tabela de segmentos.
+    Minimiza primeiro os dígitos sem palavra e depois o número de partes; em caso
+    de empate prefere o segmento inicial mais longo (como a divisão gulosa).
+    Devolve a lista de (início, fim) escolhida; dígitos sem palavra são omitidos.
+    """
+    n = len(table)
+    cost = [None] * (n + 1)
+    choice = [None] * (n + 1)
+    cost[n] = (0, 0)
+    for i in range(n - 1, -1, -1):
+        best = None
+        best_j = None
+        for j in sorted(table[i], reverse=True):
+            skips, parts = cost[j]
+            candidate = (skips, parts + 1)
+            if best is None or candidate < best:
+                best, best_j = candidate, j
+        skips, parts = cost[i + 1]
+        if best is None or (skips + 1, parts) < best:
+            best, best_j = (skips + 1, parts), None
+        cost[i] = best
+        choice[i] = best_j
+
+    spans = []
+    i = 0
+    while i < n:
+        j = choice[i]
+        if j is None:
+            i += 1
+        else:
+            spans.append((i, j))
+            i = j
+    return spans
+
+
+def segment_number(number, index, single_digit_words=None):
+    """
+    Divide `number` na sequência de blocos com palavras com menos partes.
+    Devolve partições no formato da API: [{'sequence': ..., 'words': [...]}, ...]
+    """
+    table = build_span_table(number, index, single_digit_words)
+    partitions = []
+    for i, j in best_split(table):
+        words = sorted({w for w in table[i][j] if isinstance(w, str) and w}, key=lambda w: w.lower())
+        partitions.append({'sequence': number[i:j], 'words': words})
+    return partitions
+
+
+class MemoIndex:
+    """
+    Envolve um índice e memoriza as consultas exact/prefixes_of. Útil quando muitos
+    números partilham sub-sequências (p.ex. um lote de conversões sobre o mesmo snapshot):
+    cada sub-sequência é procurada no índice uma única vez.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._exact = {}
+        self._prefixes = {}
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def exact(self, number):
+        words = self._exact.get(number)
+        if words is None:
+            words = self._exact[number] = self.index.exact(number)
+        return words
+
+    def prefixes_of(self, number, min_length=1):
+        key = (number, min_length)
+        found = self._prefixes.get(key)
+        if found is None:
+            found = self._prefixes[key] = self.index.prefixes_of(number, min_length)
+        return found
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+
+class IncrementalSegmenter:
+    """
+    Divisão gulosa de um número (o prefixo com palavras mais longo primeiro, como
+    main.find_pairs_combinations) mantida dígito a dígito enquanto se escreve.
+
+    Cada passo guardado (início, comprimento, palavras) depende só dos `window`
+    dígitos seguintes, por isso acrescentar ou apagar um dígito só refaz os passos
+    que começam nos últimos `window` dígitos; os anteriores são reutilizados.
+
+    - get_index: função sem argumentos que devolve o índice atual (se devolver outro
+      índice, p.ex. depois de um novo snapshot, tudo é recalculado)
+    - single_digit_words: função opcional dígito -> [(palavra, ''), ...]
+    - ensure_pair: função opcional chamada com o par inicial antes de cada consulta
+      (p.ex. para o procurar na API se ainda não estiver na cache)
+    """
+
+    def __init__(self, get_index, single_digit_words=None, ensure_pair=None):
+        self.get_index = get_index
+        self.single_digit_words = single_digit_words
+        self.ensure_pair = ensure_pair
+        self.number = ''
+        self._steps = []
+        self._index = None
+        self._window = 2
+
+    def push(self, digits):
+        """Acrescenta um ou mais dígitos ao fim do número."""
+        self.set(self.number + digits)
+
+    def pop(self, count=1):
+        """Apaga os últimos `count` dígitos."""
+        self.set(self.number[:max(0, len(self.number) - count)])
+
+    def set(self, number):
+        """
+        Passa a segmentar `number`, reaproveitando os passos do prefixo comum com o
+        número anterior (serve também para ressincronizar com o cliente).
+        """
+        if number.startswith(self.number):
+            common = len(self.number)
+        elif self.number.startswith(number):
+            common = len(number)
+        else:
+            common = len(os.path.commonprefix([number, self.number]))
+        self.number = number
+        self._advance(common)
+
+    def resync(self):
+        """Recalcula tudo com o índice atual."""
+        self._steps.clear()
+        self._index = None
+        self._advance(0)
+
+    def coverage(self):
+        """{sequência: [(palavra, ''), ...]} por ordem, como find_pairs_combinations."""
+        number = self.number
+        found = {}
+        for start, length, words in self._steps:
+            if words:
+                found[number[start:start + length]] = words
+        return found
+
+    def _advance(self, stable):
+        # Passos que só leram dígitos de number[:stable] continuam válidos
+        steps = self._steps
+        while steps and steps[-1][0] + self._window > stable:
+            steps.pop()
+        restarted = False
+        position = steps[-1][0] + steps[-1][1] if steps else 0
+        while position < len(self.number):
+            step, stale = self._step(position)
+            if stale and not restarted:
+                # O índice mudou: os passos anteriores podem estar desatualizados
+                restarted = True
+                steps.clear()
+                position = 0
+                continue
+            steps.append(step)
+            position += step[1]
+
+    def _step(self, position):
+        """Um passo da divisão gulosa em `position`: ((início, comprimento, palavras), índice mudou?)."""
+        remaining = self.number[position:]
+        words = None
+        length = 1
+        stale = False
+        if len(remaining) >= 2:
+            if self.ensure_pair is not None:
+                self.ensure_pair(remaining[:2])
+            index = self.get_index()
+            if index is not self._index:
+                stale = self._index is not None and position > 0
+                self._index = index
+                self._window = max(index.max_length, 2)
+            match = index.longest_prefix(remaining[:self._window], min_length=2)
+            if match:
+                length = len(match[0])
+                words = [(word, "") for word in match[1]]
+        if not words and self.single_digit_words is not None:
+            words = self.single_digit_words(remaining[0]) or None
+            length = 1
+        return (position, length, words), stale
+
+
+class IncrementalSpanTable:
+    """
+    A tabela de build_span_table mantida dígito a dígito: acrescentar um dígito só
+    procura os segmentos que terminam nele (no máximo `window` consultas ao índice),
+    apagar só os remove. partitions() devolve o mesmo que segment_number para o
+    número atual, sem voltar a consultar o índice.
+
+    - get_index / single_digit_words / ensure_pair: como em IncrementalSegmenter
+      (ensure_pair é chamada com cada par novo antes das consultas)
+    """
+
+    def __init__(self, get_index, single_digit_words=None, ensure_pair=None):
+        self.get_index = get_index
+        self.single_digit_words = single_digit_words
+        self.ensure_pair = ensure_pair
+        self.number = ''
+        self.table = []
+        self._index = None
+        self._window = 2
+        self._digit_words = {}
+
+    def set(self, number):
+        """Passa a `number`, apagando só até ao prefixo comum e acrescentando o resto."""
+        if number.startswith(self.number):
+            common = len(self.number)
+        elif self.number.startswith(number):
+            common = len(number)
+        else:
+            common = len(os.path.commonprefix([number, self.number]))
+        while len(self.number) > common:
+            self._pop()
+        for digit in number[common:]:
+            self._push(digit)
+        index = self.get_index()
+        if index is not self._index:
+            # Snapshot novo (p.ex. um par buscado à API): refazer a tabela com ele
+            self.resync()
+
+    def push(self, digits):
+        self.set(self.number + digits)
+
+    def pop(self, count=1):
+        self.set(self.number[:max(0, len(self.number) - count)])
+
+    def resync(self):
+        """Reconstrói a tabela com o índice atual."""
+        number = self.number
+        self._index = self.get_index()
+        self._window = max(self._index.max_length, 2)
+        self.number = ''
+        self.table = []
+        for digit in number:
+            self._push(digit)
+
+    def partitions(self):
+        number = self.number
+        table = self.table
+        partitions = []
+        for i, j in best_split(table):
+            words = sorted({w for w in table[i][j] if isinstance(w, str) and w}, key=lambda w: w.lower())
+            partitions.append({'sequence': number[i:j], 'words': words})
+        return partitions
+
+    def _push(self, digit):
+        number = self.number = self.number + digit
+        n = len(number)
+        if n >= 2 and self.ensure_pair is not None:
+            self.ensure_pair(number[-2:])
+        if self._index is None:
+            self._index = self.get_index()
+            self._window = max(self._index.max_length, 2)
+        spans = {}
+        if self.single_digit_words is not None:
+            if digit not in self._digit_words:
+                self._digit_words[digit] = tuple(self.single_digit_words(digit) or ())
+            if self._digit_words[digit]:
+                spans[n] = self._digit_words[digit]
+        self.table.append(spans)
+        index = self._index
+        for i in range(max(0, n - self._window), n - 1):
+            words = index.exact(number[i:])
+            if words:
+                self.table[i][n] = words
+
+    def _pop(self):
+        n = len(self.number)
+        self.table.pop()
+        for i in range(max(0, n - self._window), n - 1):
+            self.table[i].pop(n, None)
+        self.number = self.number[:-1]
@@ -0,0 +1,196 @@
+import codecs
+import re
+import unicodedata
+
+from major_encoder import encode_many
+
+# Palavras: tudo o que não é espaço nem hífen (o hífen separa palavras compostas)
+_WORD_RE = re.compile(r'[^\s-]+')
+# Letras aceites (intervalos latinos, antes de retirar os acentos)
+_LETTERS_RE = re.compile(r'[A-Za-zÀ-ÖØ-öø-ÿ]')
+# Parágrafos acabam numa linha em branco
+_BLANK_LINE_RE = re.compile(r'\s*')
+
+# Uma unidade (linha/parágrafo) maior do que isto é partida no último espaço
+MAX_UNIT_CHARS = 65536
+# Tokens codificados de cada vez e palavras distintas memorizadas entre lotes
+BATCH_TOKENS = 4096
+MEMO_WORDS = 100000
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+def strip_diacritics(s):
+    """Remove os acentos (NFD sem as marcas combinatórias)."""
+    try:
+        nfkd = unicodedata.normalize('NFD', s)
+        return ''.join(ch for ch in nfkd if not unicodedata.combining(ch))
+    except Exception:
+        return s
+
+
+class _FoldTable(dict):
+    """
+    Tabela para str.translate: cada letra aceite passa a minúscula sem acentos e
+    qualquer outro caráter é apagado. As entradas são calculadas uma vez por caráter.
+    """
+
+    def __missing__(self, code):
+        ch = chr(code)
+        folded = strip_diacritics(ch).lower() if _LETTERS_RE.fullmatch(ch) else None
+        self[code] = folded
+        return folded
+
+
+_FOLD = _FoldTable()
+
+
+def tokenize(text):
+    """
+    Divide o texto em [(original, normalizado), ...]: hífenes e espaços separam
+    palavras; tokens sem letras (números, pontuação) são ignorados.
+    """
+    if not isinstance(text, str):
+        return []
+    tokens = []
+    for original in _WORD_RE.findall(text):
+        normalized = original.translate(_FOLD)
+        if normalized:
+            tokens.append((original, normalized))
+    return tokens
+
+
+def encode_text(text):
+    """Tokens de `text` com o número de cada um: [{'original', 'normalized', 'number'}, ...]."""
+    tokens = tokenize(text)
+    numbers = encode_many(norm for _, norm in tokens)
+    return [{'original': orig, 'normalized': norm, 'number': num or ''}
+            for (orig, norm), num in zip(tokens, numbers)]
+
+
+def read_chunks(stream, limit, size=65536):
+    """Blocos de até `size` bytes de `stream`; DocumentTooLarge depois de `limit` bytes."""
+    total = 0
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > limit:
+            raise DocumentTooLarge(f'Documento demasiado grande (máximo {limit} bytes).')
+        yield chunk
+
+
+def batch_encoder(limit=MEMO_WORDS):
+    """
+    Função lista de palavras -> lista de números que codifica cada palavra distinta
+    uma vez (encode_many) e as memoriza entre chamadas, até `limit` palavras.
+    """
+    known = {}
+
+    def encode(words):
+        missing = [w for w in set(words) if w not in known]
+        if missing:
+            if len(known) + len(missing) > limit:
+                known.clear()
+            known.update(zip(missing, encode_many(missing)))
+        return [known[w] for w in words]
+    return encode
+
+
+def iter_text(chunks, encoding='utf-8'):
+    """Texto de uma sequência de blocos de bytes (ou str), descodificado incrementalmente."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray)) else chunk
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_lines(texts):
+    """(número da linha, linha) a partir de blocos de texto, sem juntar o documento todo."""
+    pending = ''
+    line_no = 1
+    for text in texts:
+        pending += text
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line_no, line
+            line_no += 1
+        while len(pending) > MAX_UNIT_CHARS:
+            # Linha enorme sem quebras: entregar até ao último espaço, sem avançar a linha
+            cut = pending.rfind(' ', 0, MAX_UNIT_CHARS) + 1 or MAX_UNIT_CHARS
+            yield line_no, pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield line_no, pending
+
+
+def iter_paragraphs(texts):
+    """(linha inicial, parágrafo) — linhas seguidas até uma linha em branco."""
+    lines = []
+    size = 0
+    start = None
+    for line_no, line in iter_lines(texts):
+        if _BLANK_LINE_RE.fullmatch(line):
+            if lines:
+                yield start, '\n'.join(lines)
+                lines, size = [], 0
+            continue
+        if not lines:
+            start = line_no
+        lines.append(line)
+        size += len(line)
+        if size > MAX_UNIT_CHARS:
+            yield start, '\n'.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield start, '\n'.join(lines)
+
+
+def encode_document(chunks, unit='line', with_tokens=False, encoding='utf-8'):
+    """
+    Codifica um documento lido aos blocos e devolve um dicionário por linha (ou
+    parágrafo, com unit='paragraph') que tenha palavras:
+      {'line', 'fullNumber', 'digitCount', 'tokenCount'[, 'tokens']}
+    As linhas são codificadas em lotes de BATCH_TOKENS tokens; a memória usada
+    depende do tamanho do lote, não do documento.
+    """
+    units = iter_paragraphs if unit == 'paragraph' else iter_lines
+    encode = batch_encoder()
+
+    def flush(batch):
+        numbers = iter(encode([norm for _, tokens in batch for _, norm in tokens]))
+        for line_no, tokens in batch:
+            token_numbers = [next(numbers) for _ in tokens]
+            full_number = ''.join(token_numbers)
+            item = {
+                'line': line_no,
+                'fullNumber': full_number,
+                'digitCount': len(full_number),
+                'tokenCount': len(tokens),
+            }
+            if with_tokens:
+                item['tokens'] = [{'original': orig, 'normalized': norm, 'number': num}
+                                  for (orig, norm), num in zip(tokens, token_numbers)]
+            yield item
+
+    batch = []
+    pending = 0
+    for line_no, text in units(iter_text(chunks, encoding)):
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        batch.append((line_no, tokens))
+        pending += len(tokens)
+        if pending >= BATCH_TOKENS:
+            yield from flush(batch)
+            batch, pending = [], 0
+    if batch:
+        yield from flush(batch)
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+
+import api_cache
+import ranking
+import word_store
+from main import find_single_digit_words
+
+# Aquecimento no arranque: "eager" (bloqueia o carregamento da app), "background"
+# (numa thread) ou "off". Por omissão é eager com MENMONICA_PRELOAD (o master do
+# gunicorn aquece uma vez e os workers herdam tudo por fork) e background sem ele.
+PRELOAD = os.environ.get('MENMONICA_PRELOAD', '').lower() in ('1', 'true', 'yes', 'on')
+MODE = os.environ.get('MENMONICA_WARMUP', 'eager' if PRELOAD else 'background').lower()
+DIGIT_CACHE_FILE = word_store.DIGIT_CACHE_FILE
+# Depois de uma falha o aquecimento é repetido numa thread (arrancada por /api/ready), com
+# espera de RETRY_SECONDS, depois o dobro, ... até RETRY_MAX_SECONDS
+RETRY_SECONDS = float(os.environ.get('MENMONICA_WARMUP_RETRY', '5'))
+RETRY_MAX_SECONDS = 300.0
+
+_lock = threading.Lock()
+# Estado do aquecimento neste processo (copiado para os workers num fork)
+_state = {'status': 'cold', 'pid': None, 'started': None, 'seconds': None, 'steps': {}, 'error': None,
+          'attempts': 0, 'retry_at': None}
+
+
+def _load_words():
+    snap = word_store.preload() if PRELOAD else word_store.get_snapshot().warm()
+    detail = f'{snap.index.word_count} palavras em {snap.index.pair_count} pares'
+    prewarm = getattr(snap.index, 'prewarm', None)
+    if prewarm is not None:
+        # Backend shards: carregar já os pares mais acedidos nas execuções anteriores
+        detail += f', {len(prewarm())} shards carregados'
+    return detail
+
+
+def _load_digit_words():
+    # Só os dígitos já guardados em digit_cache.json: o aquecimento nunca chama a API
+    try:
+        with open(DIGIT_CACHE_FILE, 'r', encoding='utf-8') as f:
+            digits = [d for d in json.load(f) if d.isdigit() and len(d) == 1]
+    except (OSError, ValueError, AttributeError):
+        return 'sem digit_cache.json'
+    for digit in sorted(digits):
+        find_single_digit_words(digit)
+    return f'{len(digits)} dígitos'
+
+
+def _load_frequencies():
+    return f'{len(ranking.get_frequency_table().counts)} frequências'
+
+
+def _open_api_cache():
+    api_cache.get_cache()
+    return 'ok'
+
+
+STEPS = (
+    ('words', _load_words),
+    ('digit_cache', _load_digit_words),
+    ('frequencies', _load_frequencies),
+    ('api_cache', _open_api_cache),
+)
+
+
+def run():
+    """Executa os passos de aquecimento por ordem, registando a duração de cada um."""
+    started = time.perf_counter()
+    _state.update(status='warming', pid=os.getpid(), started=time.time(), steps={}, error=None, retry_at=None)
+    _state['attempts'] += 1
+    try:
+        with word_store.watcher_deferred():
+            for name, step in STEPS:
+                step_started = time.perf_counter()
+                detail = step()
+                elapsed = time.perf_counter() - step_started
+                _state['steps'][name] = round(elapsed, 4)
+                print(f"Aquecimento: {name} em {elapsed:.3f}s ({detail})")
+    except Exception as e:
+        delay = min(RETRY_MAX_SECONDS, RETRY_SECONDS * 2 ** (_state['attempts'] - 1))
+        _state.update(status='failed', error=str(e), retry_at=time.time() + delay)
+        print(f"Aquecimento falhou: {e} (nova tentativa daqui a {delay:g}s)")
+        return False
+    finally:
+        _state['seconds'] = round(time.perf_counter() - started, 4)
+    # `attempts` conta as falhas seguidas, que definem a espera até à próxima tentativa
+    _state.update(status='ready', attempts=0)
+    print(f"Aquecimento concluído em {_state['seconds']:.3f}s (pid {os.getpid()})")
+    return True
+
+
+def _due():
+    status = _state['status']
+    if status == 'ready':
+        return False
+    if status == 'failed':
+        return time.time() >= (_state['retry_at'] or 0)
+    return not (status == 'warming' and _state['pid'] == os.getpid())
+
+
+def start(mode=None):
+    """
+    Arranca o aquecimento deste processo segundo `mode` (MODE por omissão), uma vez.
+    Um worker que herdou um aquecimento por terminar (a thread do master não
+    sobrevive ao fork) volta a arrancá-lo; um aquecimento que falhou é repetido
+    em segundo plano quando chega a hora da nova tentativa.
+    """
+    mode = mode or MODE
+    if not _due():
+        return
+    with _lock:
+        if not _due():
+            return
+        if mode == 'off':
+            _state.update(status='ready', pid=os.getpid(), seconds=0.0, error=None)
+            return
+        if mode == 'eager' and _state['status'] != 'failed':
+            run()
+            return
+        _state.update(status='warming', pid=os.getpid())
+        threading.Thread(target=run, name='menmonica-warmup', daemon=True).start()
+
+
+def _index_state():
+    snap, watching = word_store.current()
+    if snap is None:
+        return {'loaded': False, 'backend': word_store.BACKEND}
+    index = snap.index
+    state = {
+        'loaded': True,
+        'backend': word_store.BACKEND,
+        'type': type(index).__name__,
+        'available': snap.available,
+        'words': index.word_count,
+        'pairs': index.pair_count,
+        'tag': snap.tag,
+        'watcher': watching,
+    }
+    if hasattr(index, 'shard_stats'):
+        state['shards'] = index.shard_stats()
+    return state
+
+
+def status():
+    """(pronto?, detalhes) — pronto só depois de o aquecimento terminar com sucesso."""
+    details = {k: v for k, v in _state.items() if k != 'pid'}
+    details['index'] = _index_state()
+    return _state['status'] == 'ready', details
@@ -0,0 +1,488 @@
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+
+from major_encoder import encode_many
+
+
+class WordIndex:
+    """
+    Índice em memória das palavras pelo seu número Major completo.
+
+    Funciona como uma trie "achatada": cada número completo é uma chave de um dict,
+    por isso as consultas custam O(comprimento do número) e não O(tamanho do par):
+      - exact(n): palavras cujo número é exatamente n
+      - prefixes_of(n): palavras cujo número é um prefixo de n (do mais curto ao mais longo)
+      - longest_prefix(n): o prefixo mais longo de n que tem palavras
+    """
+
+    __slots__ = ("_by_number", "_pair_sizes", "max_length", "word_count", "pair_count")
+
+    def __init__(self, by_number, pair_sizes):
+        self._by_number = by_number
+        self._pair_sizes = pair_sizes
+        self.max_length = max((len(n) for n in by_number), default=0)
+        self.word_count = sum(len(ws) for ws in by_number.values())
+        self.pair_count = sum(1 for size in pair_sizes.values() if size > 0)
+
+    @classmethod
+    def from_cache(cls, cache):
+        """
+        Constrói o índice a partir da estrutura de two_digit_cache.json
+        ({par: [{"word", "number"}, ...]}). Os números são recalculados com o
+        codificador para coincidirem sempre com word_to_major_number.
+        """
+        words = []
+        pair_sizes = {}
+        if isinstance(cache, dict):
+            for pair, entries in cache.items():
+                if not isinstance(entries, (list, tuple)):
+                    continue
+                count = 0
+                for wd in entries:
+                    if isinstance(wd, dict) and isinstance(wd.get("word"), str) and wd.get("word"):
+                        words.append(wd["word"])
+                        count += 1
+                pair_sizes[pair] = count
+
+        grouped = {}
+        seen = set()
+        for word, number in zip(words, encode_many(words)):
+            if not number or (number, word) in seen:
+                continue
+            seen.add((number, word))
+            grouped.setdefault(number, []).append(word)
+
+        return cls({n: tuple(ws) for n, ws in grouped.items()}, pair_sizes)
+
+    def extended(self, pair, words):
+        """
+        Novo índice com `words` acrescentadas ao par (o original não é alterado).
+        Copia apenas os dicts de topo, sem recalcular as palavras existentes.
+        """
+        by_number = dict(self._by_number)
+        added = 0
+        for word, number in zip(words, encode_many(words)):
+            existing = by_number.get(number, ())
+            if not number or word in existing:
+                continue
+            by_number[number] = existing + (word,)
+            added += 1
+        pair_sizes = dict(self._pair_sizes)
+        pair_sizes[pair] = pair_sizes.get(pair, 0) + added
+        return WordIndex(by_number, pair_sizes)
+
+    def __len__(self):
+        return self.word_count
+
+    def has_pair(self, pair):
+        """True se o par existir na cache com pelo menos uma palavra."""
+        return self._pair_sizes.get(pair, 0) > 0
+
+    def iter_entries(self):
+        """Percorre todas as entradas como (palavra, número)."""
+        for number, words in self._by_number.items():
+            for word in words:
+                yield word, number
+
+    def iter_numbers(self):
+        """Cada número com palavras, uma vez."""
+        return iter(self._by_number)
+
+    def pair_words(self, pair):
+        """Palavras cujo número começa pelo par (percorre o índice todo)."""
+        return [w for number, words in self._by_number.items() if number.startswith(pair) for w in words]
+
+    def pair_size(self, pair):
+        return self._pair_sizes.get(pair, 0)
+
+    def exact(self, number):
+        return self._by_number.get(number, ())
+
+    def prefixes_of(self, number, min_length=1):
+        """
+        Devolve [(prefixo, palavras), ...] para cada prefixo de `number` com palavras,
+        por ordem crescente de comprimento.
+        """
+        by_number = self._by_number
+        found = []
+        for k in range(max(min_length, 1), min(len(number), self.max_length) + 1):
+            words = by_number.get(number[:k])
+            if words:
+                found.append((number[:k], words))
+        return found
+
+    def longest_prefix(self, number, min_length=1):
+        by_number = self._by_number
+        for k in range(min(len(number), self.max_length), max(min_length, 1) - 1, -1):
+            words = by_number.get(number[:k])
+            if words:
+                return number[:k], words
+        return None
+
+
+# Formato binário compacto (word_index.bin), gerado por build_word_index.py.
+# Todos os inteiros são u32 little-endian; os números estão ordenados para pesquisa binária.
+#
+#   cabeçalho   MAGIC, versão, n_números, n_palavras, tamanho dos blobs, comprimento máximo
+#   pares       100 x u32: nº de palavras por par 00..99
+#   num_offsets (n_números + 1) x u32: limites de cada número em num_blob
+#   word_ranges (n_números + 1) x u32: primeira palavra de cada número
+#   word_offsets (n_palavras + 1) x u32: limites de cada palavra em word_blob
+#   num_blob    números em ASCII, concatenados
+#   word_blob   palavras em UTF-8, concatenadas
+INDEX_MAGIC = b"MNIX"
+INDEX_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHIIIII")
+
+
+def _u32_array(values):
+    arr = array("I", values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def write_index_file(path, by_number, pair_sizes):
+    """
+    Escreve o índice binário de forma atómica (ficheiro temporário + os.replace).
+    by_number: {número: [palavras]}; pair_sizes: {par: nº de palavras}.
+    """
+    numbers = sorted(n for n, ws in by_number.items() if n and ws)
+    num_blob = bytearray()
+    word_blob = bytearray()
+    num_offsets = [0]
+    word_ranges = [0]
+    word_offsets = [0]
+    for number in numbers:
+        num_blob += number.encode("ascii")
+        num_offsets.append(len(num_blob))
+        for word in by_number[number]:
+            word_blob += word.encode("utf-8")
+            word_offsets.append(len(word_blob))
+        word_ranges.append(len(word_offsets) - 1)
+
+    header = _HEADER.pack(
+        INDEX_MAGIC, INDEX_FORMAT_VERSION, 0,
+        len(numbers), len(word_offsets) - 1, len(num_blob), len(word_blob),
+        max((len(n) for n in numbers), default=0),
+    )
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(_u32_array(pair_sizes.get(f"{i:02d}", 0) for i in range(100)).tobytes())
+        f.write(_u32_array(num_offsets).tobytes())
+        f.write(_u32_array(word_ranges).tobytes())
+        f.write(_u32_array(word_offsets).tobytes())
+        f.write(num_blob)
+        f.write(word_blob)
+    os.replace(tmp_path, path)
+    return len(numbers), len(word_offsets) - 1
+
+
+class MappedWordIndex:
+    """
+    Leitura do índice binário via mmap, com a mesma interface do WordIndex.
+    As páginas do ficheiro são partilhadas por todos os workers (page cache) e
+    nada é convertido em objetos Python até ser consultado.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        magic, fmt, _, n_numbers, n_words, num_len, word_len, max_length = _HEADER.unpack_from(mm, 0)
+        if magic != INDEX_MAGIC or fmt != INDEX_FORMAT_VERSION:
+            mm.close()
+            raise ValueError(f"Formato de índice inválido: {path}")
+        self._n = n_numbers
+        self.word_count = n_words
+        self.max_length = max_length
+
+        offset = _HEADER.size
+        pairs, offset = self._u32(offset, 100)
+        self._num_offsets, offset = self._u32(offset, n_numbers + 1)
+        self._word_ranges, offset = self._u32(offset, n_numbers + 1)
+        self._word_offsets, offset = self._u32(offset, n_words + 1)
+        self._num_base = offset
+        self._word_base = offset + num_len
+        self._pair_sizes = {f"{i:02d}": pairs[i] for i in range(100) if pairs[i]}
+        self.pair_count = len(self._pair_sizes)
+
+    def _u32(self, offset, count):
+        end = offset + 4 * count
+        view = memoryview(self._mm)[offset:end]
+        if sys.byteorder == "little":
+            return view.cast("I"), end
+        arr = array("I", view.tobytes())
+        arr.byteswap()
+        return arr, end
+
+    def __len__(self):
+        return self.word_count
+
+    def close(self):
+        self._mm.close()
+
+    def has_pair(self, pair):
+        return self._pair_sizes.get(pair, 0) > 0
+
+    def pair_size(self, pair):
+        return self._pair_sizes.get(pair, 0)
+
+    def _number_at(self, i):
+        base = self._num_base
+        return self._mm[base + self._num_offsets[i]:base + self._num_offsets[i + 1]]
+
+    def _words_at(self, i):
+        mm = self._mm
+        base = self._word_base
+        offsets = self._word_offsets
+        return tuple(
+            mm[base + offsets[j]:base + offsets[j + 1]].decode("utf-8")
+            for j in range(self._word_ranges[i], self._word_ranges[i + 1])
+        )
+
+    def _search(self, key, lo=0):
+        """Pesquisa binária; devolve (posição de inserção, encontrado)."""
+        hi = self._n
+        number_at = self._number_at
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if number_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo, lo < self._n and number_at(lo) == key
+
+    def exact(self, number):
+        try:
+            key = number.encode("ascii")
+        except UnicodeEncodeError:
+            return ()
+        pos, found = self._search(key)
+        return self._words_at(pos) if found else ()
+
+    def prefixes_of(self, number, min_length=1):
+        try:
+            key = number.encode("ascii")
+        except UnicodeEncodeError:
+            return []
+        found = []
+        lo = 0
+        # Prefixos mais longos ordenam-se depois dos mais curtos: a pesquisa recomeça onde parou
+        for k in range(max(min_length, 1), min(len(key), self.max_length) + 1):
+            lo, hit = self._search(key[:k], lo)
+            if hit:
+                found.append((number[:k], self._words_at(lo)))
+        return found
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+    def pair_words(self, pair):
+        """Palavras cujo número começa pelo par (intervalo contíguo na ordem dos números)."""
+        key = pair.encode("ascii")
+        start, _ = self._search(key)
+        end, _ = self._search(key + b":", start)  # ':' ordena logo a seguir a '9'
+        return [w for i in range(start, end) for w in self._words_at(i)]
+
+    def iter_entries(self):
+        for i in range(self._n):
+            number = self._number_at(i).decode("ascii")
+            for word in self._words_at(i):
+                yield word, number
+
+    def iter_numbers(self):
+        for i in range(self._n):
+            yield self._number_at(i).decode("ascii")
+
+
+# Tabela com números pré-calculados em dictionary.db (ver build_word_index.py --sqlite)
+WORD_TABLE = "word_numbers"
+WORD_TABLE_SCHEMA = (
+    f"CREATE TABLE IF NOT EXISTS {WORD_TABLE} ("
+    "word TEXT NOT NULL, normalized TEXT NOT NULL, number TEXT NOT NULL, first_two TEXT NOT NULL)",
+    f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{WORD_TABLE}_number_word ON {WORD_TABLE}(number, word)",
+    f"CREATE INDEX IF NOT EXISTS idx_{WORD_TABLE}_first_two ON {WORD_TABLE}(first_two)",
+)
+
+
+def normalize_for_lookup(word):
+    """Minúsculas e sem diacríticos (coluna `normalized`)."""
+    nfkd = unicodedata.normalize("NFD", word)
+    return "".join(ch for ch in nfkd if not unicodedata.combining(ch)).lower()
+
+
+def write_word_table(db_path, entries, replace=False):
+    """
+    Insere (palavra, número) na tabela indexada de `db_path`, criando-a se preciso.
+    Com replace=True o conteúdo anterior da tabela é substituído.
+    Devolve o número de linhas novas.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            for statement in WORD_TABLE_SCHEMA:
+                conn.execute(statement)
+            if replace:
+                conn.execute(f"DELETE FROM {WORD_TABLE}")
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {WORD_TABLE}(word, normalized, number, first_two) VALUES (?, ?, ?, ?)",
+                ((w, normalize_for_lookup(w), n, n[:2]) for w, n in entries if w and n),
+            )
+            return conn.total_changes - before
+    finally:
+        conn.close()
+
+
+class SQLiteWordIndex:
+    """
+    Índice servido diretamente pela tabela `word_numbers` (consultas com índice B-tree),
+    para dicionários maiores do que cabe confortavelmente em memória.
+    Cada thread reutiliza a sua ligação só de leitura; após um fork é aberta uma nova.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        row = conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX(LENGTH(number)), 0), COUNT(DISTINCT first_two) FROM {WORD_TABLE}"
+        ).fetchone()
+        self.word_count, self.max_length, self.pair_count = row
+
+    def _conn(self):
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            local.conn = conn
+            local.pid = os.getpid()
+        return conn
+
+    def __len__(self):
+        return self.word_count
+
+    def has_pair(self, pair):
+        row = self._conn().execute(f"SELECT 1 FROM {WORD_TABLE} WHERE first_two = ? LIMIT 1", (pair,)).fetchone()
+        return row is not None
+
+    def pair_size(self, pair):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {WORD_TABLE} WHERE first_two = ?", (pair,)).fetchone()[0]
+
+    def exact(self, number):
+        rows = self._conn().execute(f"SELECT word FROM {WORD_TABLE} WHERE number = ? ORDER BY rowid", (number,))
+        return tuple(r[0] for r in rows)
+
+    def prefixes_of(self, number, min_length=1):
+        prefixes = [number[:k] for k in range(max(min_length, 1), min(len(number), self.max_length) + 1)]
+        if not prefixes:
+            return []
+        rows = self._conn().execute(
+            f"SELECT number, word FROM {WORD_TABLE} WHERE number IN ({','.join('?' * len(prefixes))}) ORDER BY rowid",
+            prefixes,
+        )
+        grouped = {}
+        for n, w in rows:
+            grouped.setdefault(n, []).append(w)
+        return [(p, tuple(grouped[p])) for p in prefixes if p in grouped]
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+    def pair_words(self, pair):
+        rows = self._conn().execute(f"SELECT word FROM {WORD_TABLE} WHERE first_two = ?", (pair,))
+        return [r[0] for r in rows]
+
+    def iter_entries(self):
+        # Cursor próprio: o iterador pode ficar aberto enquanto a ligação é usada noutras consultas
+        yield from self._conn().cursor().execute(f"SELECT word, number FROM {WORD_TABLE}")
+
+    def iter_numbers(self):
+        for (number,) in self._conn().cursor().execute(f"SELECT DISTINCT number FROM {WORD_TABLE}"):
+            yield number
+
+
+class LayeredWordIndex:
+    """
+    Índice binário (MappedWordIndex) com as entradas do JSON/journal que ele ainda não
+    tem num WordIndex pequeno por cima. Assim as palavras acrescentadas depois do build
+    (journal, compactações) aparecem sem trocar de corpus: as palavras que só vieram de
+    dictionary.db continuam no índice de base e o mmap continua a ser partilhado.
+    """
+
+    def __init__(self, base, overlay):
+        self.base = base
+        self.overlay = overlay
+        self.max_length = max(base.max_length, overlay.max_length)
+        self.word_count = base.word_count + overlay.word_count
+        pairs = {f"{i:02d}" for i in range(100)}
+        self.pair_count = sum(1 for p in pairs if base.has_pair(p) or overlay.has_pair(p))
+
+    @classmethod
+    def over(cls, base, cache):
+        """Camada com as entradas de `cache` (estrutura de two_digit_cache.json) que faltam em `base`."""
+        entries = []
+        if isinstance(cache, dict):
+            for pair, bucket in cache.items():
+                if isinstance(bucket, (list, tuple)):
+                    entries.extend((pair, wd["word"]) for wd in bucket
+                                   if isinstance(wd, dict) and isinstance(wd.get("word"), str) and wd.get("word"))
+        delta = {}
+        for (pair, word), number in zip(entries, encode_many([w for _, w in entries])):
+            if number and word not in base.exact(number):
+                delta.setdefault(pair, []).append({"word": word, "number": number})
+        return cls(base, WordIndex.from_cache(delta))
+
+    def extended(self, pair, words):
+        fresh = [w for w, n in zip(words, encode_many(words)) if n and w not in self.base.exact(n)]
+        return LayeredWordIndex(self.base, self.overlay.extended(pair, fresh))
+
+    def __len__(self):
+        return self.word_count
+
+    def has_pair(self, pair):
+        return self.base.has_pair(pair) or self.overlay.has_pair(pair)
+
+    def pair_size(self, pair):
+        return self.base.pair_size(pair) + self.overlay.pair_size(pair)
+
+    def exact(self, number):
+        extra = self.overlay.exact(number)
+        return self.base.exact(number) + extra if extra else self.base.exact(number)
+
+    def prefixes_of(self, number, min_length=1):
+        extra = dict(self.overlay.prefixes_of(number, min_length))
+        if not extra:
+            return self.base.prefixes_of(number, min_length)
+        found = dict(self.base.prefixes_of(number, min_length))
+        for prefix, words in extra.items():
+            found[prefix] = found.get(prefix, ()) + words
+        return sorted(found.items(), key=lambda item: len(item[0]))
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+    def pair_words(self, pair):
+        return self.base.pair_words(pair) + self.overlay.pair_words(pair)
+
+    def iter_entries(self):
+        yield from self.base.iter_entries()
+        yield from self.overlay.iter_entries()
+
+    def iter_numbers(self):
+        yield from self.base.iter_numbers()
+        exact = self.base.exact
+        for number in self.overlay.iter_numbers():
+            if not exact(number):
+                yield number
@@ -0,0 +1,161 @@
+import json
+import os
+from contextlib import contextmanager
+
+CACHE_FILE = 'two_digit_cache.json'
+# Entradas novas são acrescentadas aqui (uma por linha, JSON) em vez de reescrever a cache
+JOURNAL_FILE = 'two_digit_cache.journal'
+LOCK_FILE = 'two_digit_cache.lock'
+# Número de entradas no journal a partir do qual é compactado para o ficheiro principal
+COMPACT_THRESHOLD = int(os.environ.get('MENMONICA_JOURNAL_COMPACT', '500'))
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+@contextmanager
+def locked(lock_file=LOCK_FILE):
+    """
+    Lock exclusivo entre processos (workers do gunicorn, scripts offline) para
+    escritas no journal e na cache principal.
+    """
+    with open(lock_file, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append(pair, entries, journal_file=JOURNAL_FILE):
+    """
+    Acrescenta entradas {"word", "number"} do par ao journal. O custo é proporcional
+    às entradas novas; devolve o número de linhas no journal depois da escrita.
+    """
+    lines = ''.join(
+        json.dumps({'pair': pair, 'word': e['word'], 'number': e['number']}, ensure_ascii=False) + '\n'
+        for e in entries
+    )
+    with locked():
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return _count_lines(journal_file)
+
+
+def _count_lines(path):
+    try:
+        with open(path, 'rb') as f:
+            return sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 16), b''))
+    except OSError:
+        return 0
+
+
+def read_journal(journal_file=JOURNAL_FILE):
+    """Lê as entradas do journal, ignorando linhas incompletas ou inválidas."""
+    entries = []
+    try:
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(e, dict) and isinstance(e.get('pair'), str) and isinstance(e.get('word'), str):
+                    entries.append(e)
+    except OSError:
+        pass
+    return entries
+
+
+def apply_journal(cache, entries):
+    """
+    Aplica as entradas do journal à cache (in place), sem duplicar palavras por par.
+    Usa um conjunto por par, por isso é O(entradas) e não O(entradas x tamanho do par).
+    """
+    seen = {}
+    for e in entries:
+        pair = e['pair']
+        bucket = cache.setdefault(pair, [])
+        words = seen.get(pair)
+        if words is None:
+            words = seen[pair] = {wd.get('word') for wd in bucket if isinstance(wd, dict)}
+        if e['word'] not in words:
+            words.add(e['word'])
+            bucket.append({'word': e['word'], 'number': e.get('number', '')})
+    return cache
+
+
+def load_cache(cache_file=CACHE_FILE, journal_file=JOURNAL_FILE):
+    """Cache principal com o journal aplicado por cima."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except Exception:
+        cache = {}
+    if not isinstance(cache, dict):
+        cache = {}
+    return apply_journal(cache, read_journal(journal_file))
+
+
+def write_cache(cache, cache_file=CACHE_FILE):
+    """Escrita atómica da cache principal (ficheiro temporário + os.replace)."""
+    tmp_path = cache_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, cache_file)
+
+
+def _replace_cache_locked(cache, cache_file, journal_file):
+    entries = read_journal(journal_file)
+    write_cache(apply_journal(cache, entries), cache_file)
+    if entries:
+        with open(journal_file, 'w', encoding='utf-8'):
+            pass
+    return len(entries)
+
+
+def replace_cache(cache, cache_file=CACHE_FILE, journal_file=JOURNAL_FILE):
+    """
+    Substitui a cache principal por `cache` (p.ex. scripts que a reconstroem), incorporando
+    e esvaziando o journal sob o lock. Devolve o número de entradas do journal incorporadas.
+    """
+    with locked():
+        return _replace_cache_locked(cache, cache_file, journal_file)
+
+
+def update_cache(update, cache_file=CACHE_FILE, journal_file=JOURNAL_FILE):
+    """
+    Lê a cache atual (com o journal), aplica `update(cache)` e grava o resultado, tudo sob o
+    lock: o que os workers acrescentaram ou compactaram entretanto não se perde. Devolve a cache gravada.
+    """
+    with locked():
+        cache = update(load_cache(cache_file, journal_file))
+        _replace_cache_locked(cache, cache_file, journal_file)
+        return cache
+
+
+def compact(cache_file=CACHE_FILE, journal_file=JOURNAL_FILE):
+    """
+    Incorpora o journal na cache principal e esvazia-o. Devolve o número de
+    entradas compactadas.
+    """
+    with locked():
+        if not read_journal(journal_file):
+            return 0
+        return _replace_cache_locked(load_cache(cache_file, os.devnull), cache_file, journal_file)
@@ -0,0 +1,409 @@
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from itertools import accumulate
+
+import word_journal
+from major_encoder import encode_many
+
+# Palavras repartidas por ficheiros, um por par (00.json … 99.json) e um por dígito
+# (digit-0.json … digit-9.json), gerados por build_word_index.py --shards
+SHARD_DIR = os.environ.get('MENMONICA_WORD_SHARDS', 'word_shards')
+# Memória (MB, estimativa por processo) para os shards carregados; os menos usados saem primeiro
+MEMORY_BUDGET = int(float(os.environ.get('MENMONICA_SHARD_MEMORY_MB', '64')) * 1024 * 1024)
+# Shards mais acedidos (segundo stats.json) carregados no aquecimento; 0 desativa
+PREWARM_SHARDS = int(os.environ.get('MENMONICA_SHARD_PREWARM', '20'))
+# De quantos em quantos segundos as contagens de acessos são juntadas a stats.json
+STATS_INTERVAL = float(os.environ.get('MENMONICA_SHARD_STATS_INTERVAL', '60'))
+
+MANIFEST_FILE = 'manifest.json'
+STATS_FILE = 'stats.json'
+LOCK_FILE = 'shards.lock'
+FORMAT_VERSION = 1
+DIGIT_PREFIX = 'digit-'
+
+
+def shard_of(number):
+    """Nome do shard onde está `number`: os dois primeiros dígitos."""
+    return number[:2]
+
+
+def _shard_path(directory, name):
+    return os.path.join(directory, f'{name}.json')
+
+
+def _dump(path, data):
+    """Escreve JSON de forma atómica (ficheiro temporário + os.replace); devolve os bytes escritos."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return payload
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_manifest(directory=SHARD_DIR):
+    manifest = _read_json(os.path.join(directory, MANIFEST_FILE))
+    if not isinstance(manifest, dict) or manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f'Manifesto de shards inválido: {directory}')
+    return manifest
+
+
+def read_shard(directory, name):
+    """Conteúdo de um shard: {número: tuplo de palavras}."""
+    data = _read_json(_shard_path(directory, name))
+    return {number: tuple(words) for number, words in data.items()}
+
+
+def _write_shard(directory, name, by_number):
+    payload = _dump(_shard_path(directory, name), {n: list(ws) for n, ws in sorted(by_number.items())})
+    # A versão vem do conteúdo: um shard que não mudou continua válido na memória
+    return {'version': f'{zlib.crc32(payload):08x}', 'numbers': len(by_number), 'bytes': len(payload)}
+
+
+def _write_manifest(directory, shards, pair_sizes):
+    pair_shards = [name for name in shards if not name.startswith(DIGIT_PREFIX)]
+    manifest = {
+        'format': FORMAT_VERSION,
+        'max_length': max((shards[name].get('max_length', 0) for name in pair_shards), default=0),
+        'word_count': sum(shards[name].get('words', 0) for name in pair_shards),
+        'pairs': {p: n for p, n in sorted(pair_sizes.items()) if n},
+        'shards': dict(sorted(shards.items())),
+    }
+    # O manifesto é escrito por último: o seu mtime é a versão dos dados (ver word_store)
+    _dump(os.path.join(directory, MANIFEST_FILE), manifest)
+    return manifest
+
+
+def _shard_meta(directory, name, by_number):
+    meta = _write_shard(directory, name, by_number)
+    meta['words'] = sum(len(ws) for ws in by_number.values())
+    meta['max_length'] = max((len(n) for n in by_number), default=0)
+    return meta
+
+
+def write_shards(directory, by_number, pair_sizes, digit_words=None):
+    """
+    Reparte {número: [palavras]} pelos shards de `directory` (criado se preciso) e
+    escreve o manifesto. `digit_words` ({dígito: [palavras]}, como digit_cache.json)
+    dá os shards de dígitos únicos. Shards antigos que deixaram de existir são apagados.
+    Devolve (nº de shards, nº de palavras).
+    """
+    os.makedirs(directory, exist_ok=True)
+    grouped = {}
+    for number, words in by_number.items():
+        if number and words:
+            grouped.setdefault(shard_of(number), {})[number] = words
+    shards = {name: _shard_meta(directory, name, numbers) for name, numbers in grouped.items()}
+    for digit, words in (digit_words or {}).items():
+        if words:
+            shards[DIGIT_PREFIX + digit] = _write_shard(directory, DIGIT_PREFIX + digit, {digit: words})
+    for entry in os.listdir(directory):
+        name, ext = os.path.splitext(entry)
+        if ext == '.json' and name not in shards and (name.isdigit() or name.startswith(DIGIT_PREFIX)):
+            os.remove(os.path.join(directory, entry))
+    manifest = _write_manifest(directory, shards, pair_sizes)
+    return len(shards), manifest['word_count']
+
+
+def add_words(directory, pair, words):
+    """
+    Acrescenta `words` (encontradas para `pair`) aos shards em disco, sob lock entre
+    processos. Só os shards alterados e o manifesto são reescritos. Devolve o nº de palavras novas.
+    """
+    with word_journal.locked(os.path.join(directory, LOCK_FILE)):
+        manifest = read_manifest(directory)
+        shards = manifest['shards']
+        pair_sizes = dict(manifest['pairs'])
+        changed = {}
+        added = 0
+        for word, number in zip(words, encode_many(words)):
+            if not word or not number:
+                continue
+            name = shard_of(number)
+            if name not in changed:
+                changed[name] = read_shard(directory, name) if name in shards else {}
+            existing = changed[name].get(number, ())
+            if word in existing:
+                continue
+            changed[name][number] = existing + (word,)
+            added += 1
+        if not added:
+            return 0
+        for name, by_number in changed.items():
+            shards[name] = _shard_meta(directory, name, by_number)
+        pair_sizes[pair] = pair_sizes.get(pair, 0) + added
+        _write_manifest(directory, shards, pair_sizes)
+    return added
+
+
+def _size_of(data):
+    """Estimativa (sys.getsizeof) da memória de um shard carregado."""
+    size = sys.getsizeof(data)
+    for number, words in data.items():
+        size += sys.getsizeof(number) + sys.getsizeof(words) + sum(sys.getsizeof(w) for w in words)
+    return size
+
+
+class ShardCache:
+    """
+    Shards carregados neste processo, numa LRU limitada por `budget` bytes (estimados).
+    É partilhada por todos os ShardedWordIndex do processo: um snapshot novo reaproveita
+    os shards cuja versão não mudou. Conta também os acessos por shard, que são
+    juntados a stats.json para o aquecimento seguinte escolher os mais usados.
+    """
+
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self._entries = OrderedDict()  # (diretório, nome) -> (versão, dados, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = Counter()  # (diretório, nome) -> acessos ainda não guardados
+        self._flushed = time.monotonic()
+        self.hits = self.loads = self.evictions = 0
+
+    def get(self, directory, name, version, count=True):
+        key = (directory, name)
+        with self._lock:
+            if count:
+                self._counts[key] += 1
+            item = self._entries.get(key)
+            if item is not None and item[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                data = item[1]
+            else:
+                data = None
+            flush = STATS_INTERVAL > 0 and time.monotonic() - self._flushed >= STATS_INTERVAL
+            if flush:
+                self._flushed = time.monotonic()
+        if flush:
+            self.flush_stats()
+        if data is not None:
+            return data
+        # Leitura fora do lock: outros shards continuam a ser servidos entretanto
+        data = read_shard(directory, name)
+        size = _size_of(data)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (version, data, size)
+            self._bytes += size
+            self.loads += 1
+            # O shard acabado de ler fica sempre, mesmo que sozinho exceda o orçamento
+            while self._bytes > self.budget and len(self._entries) > 1:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return data
+
+    def peek(self, directory, name, version):
+        """O shard se já estiver carregado (sem contar o acesso nem mexer na ordem), senão None."""
+        with self._lock:
+            item = self._entries.get((directory, name))
+        return item[1] if item is not None and item[0] == version else None
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def flush_stats(self):
+        """Junta as contagens de acessos pendentes aos stats.json dos diretórios."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        by_directory = {}
+        for (directory, name), n in counts.items():
+            by_directory.setdefault(directory, Counter())[name] += n
+        for directory, new_counts in by_directory.items():
+            try:
+                with word_journal.locked(os.path.join(directory, LOCK_FILE)):
+                    merged = Counter(read_stats(directory))
+                    merged.update(new_counts)
+                    _dump(os.path.join(directory, STATS_FILE), dict(merged.most_common()))
+            except OSError as e:
+                print(f"Estatísticas de shards não guardadas ({directory}): {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget': self.budget,
+                'bytes': self._bytes,
+                'loaded': len(self._entries),
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+    def _reset_after_fork(self):
+        # O lock pode ter ficado preso noutra thread; as contagens herdadas são do processo pai
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._flushed = time.monotonic()
+
+
+def read_stats(directory=SHARD_DIR):
+    """Acessos acumulados por shard ({nome: contagem}); vazio se ainda não houver."""
+    try:
+        stats = _read_json(os.path.join(directory, STATS_FILE))
+    except (OSError, ValueError):
+        return {}
+    return {k: v for k, v in stats.items() if isinstance(v, int)} if isinstance(stats, dict) else {}
+
+
+_cache = ShardCache()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_cache._reset_after_fork)
+atexit.register(_cache.flush_stats)
+
+
+class ShardedWordIndex:
+    """
+    Índice com a mesma interface do WordIndex cujos pares são lidos dos shards só quando
+    são consultados e mantidos numa LRU com orçamento de memória (ShardCache).
+    Contagens e tamanhos dos pares vêm do manifesto, sem abrir nenhum shard.
+    """
+
+    def __init__(self, directory=SHARD_DIR, cache=None):
+        manifest = read_manifest(directory)
+        self.directory = directory
+        self._cache = cache or _cache
+        self._versions = {name: meta['version'] for name, meta in manifest['shards'].items()}
+        self._file_sizes = {name: meta.get('bytes', 0) for name, meta in manifest['shards'].items()}
+        self._pair_sizes = dict(manifest['pairs'])
+        self.max_length = manifest['max_length']
+        self.word_count = manifest['word_count']
+        self.pair_count = len(self._pair_sizes)
+        self._pair_names = sorted(self._pair_sizes)
+        self._pair_weights = list(accumulate(self._pair_sizes[p] for p in self._pair_names))
+
+    def _shard(self, name, count=True):
+        version = self._versions.get(name)
+        if version is None:
+            return {}
+        return self._cache.get(self.directory, name, version, count)
+
+    def _pair_shards(self):
+        return sorted(name for name in self._versions if not name.startswith(DIGIT_PREFIX))
+
+    def _scan(self, name):
+        # Percorrer tudo (iter_entries, filtros) não deve expulsar os shards em uso
+        data = self._cache.peek(self.directory, name, self._versions[name])
+        return data if data is not None else read_shard(self.directory, name)
+
+    def __len__(self):
+        return self.word_count
+
+    def has_pair(self, pair):
+        return self._pair_sizes.get(pair, 0) > 0
+
+    def pair_size(self, pair):
+        return self._pair_sizes.get(pair, 0)
+
+    def exact(self, number):
+        return self._shard(shard_of(number)).get(number, ())
+
+    def prefixes_of(self, number, min_length=1):
+        found = []
+        start = max(min_length, 1)
+        end = min(len(number), self.max_length)
+        if start == 1 and end >= 1:
+            words = self._shard(number[:1]).get(number[:1])
+            if words:
+                found.append((number[:1], words))
+            start = 2
+        if start > end:
+            return found
+        # Os prefixos com 2 ou mais dígitos estão todos no mesmo shard
+        shard = self._shard(number[:2])
+        for k in range(start, end + 1):
+            prefix = number[:k]
+            words = shard.get(prefix)
+            if words:
+                found.append((prefix, words))
+        return found
+
+    def longest_prefix(self, number, min_length=1):
+        found = self.prefixes_of(number, min_length)
+        return found[-1] if found else None
+
+    def pair_words(self, pair):
+        return [w for words in self._shard(pair).values() for w in words]
+
+    def digit_words(self, digit):
+        """Palavras do dígito único (shard digit-N), ou None se não houver shard para ele."""
+        if DIGIT_PREFIX + digit not in self._versions:
+            return None
+        return self._shard(DIGIT_PREFIX + digit).get(digit, ())
+
+    def iter_entries(self):
+        for name in self._pair_shards():
+            for number, words in self._scan(name).items():
+                for word in words:
+                    yield word, number
+
+    def iter_numbers(self):
+        for name in self._pair_shards():
+            yield from self._scan(name)
+
+    def random_entries(self, count, rng=random):
+        """
+        `count` entradas (palavra, número) ao acaso, sem percorrer o corpus: o par é escolhido
+        com peso igual ao seu número de palavras no manifesto e a palavra dentro do shard,
+        carregado pela ShardCache (conta para o orçamento de memória como qualquer consulta).
+        """
+        if not self._pair_names:
+            return
+        for pair in rng.choices(self._pair_names, cum_weights=self._pair_weights, k=count):
+            shard = self._shard(pair, count=False)
+            total = sum(len(words) for words in shard.values())
+            if not total:
+                continue
+            at = rng.randrange(total)
+            for number, words in shard.items():
+                if at < len(words):
+                    yield words[at], number
+                    break
+                at -= len(words)
+
+    def prewarm(self, limit=PREWARM_SHARDS):
+        """
+        Carrega os `limit` shards mais acedidos segundo stats.json (sem estatísticas, os
+        pares com mais palavras), parando antes de encher o orçamento. Devolve os nomes carregados.
+        """
+        stats = read_stats(self.directory)
+        names = sorted(self._versions, key=lambda n: (-stats.get(n, 0), -self._pair_sizes.get(n, 0), n))
+        cache = self._cache
+        loaded = []
+        start, file_bytes = cache.bytes, 0
+        for name in names[:max(limit, 0)]:
+            if loaded:
+                # Tamanho em memória estimado pela proporção memória/ficheiro dos já carregados,
+                # para não expulsar os shards mais acedidos com os menos acedidos
+                expected = self._file_sizes.get(name, 0) * (cache.bytes - start) / max(file_bytes, 1)
+                if cache.bytes + expected > cache.budget:
+                    break
+            self._shard(name, count=False)
+            file_bytes += self._file_sizes.get(name, 0)
+            loaded.append(name)
+        # Os mais acedidos ficam no fim da LRU, os últimos a sair
+        for name in reversed(loaded):
+            self._shard(name, count=False)
+        return loaded
+
+    def shard_stats(self):
+        stats = self._cache.stats()
+        stats['shards'] = len(self._versions)
+        return stats
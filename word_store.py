@@ -0,0 +1,500 @@
+import gc
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from types import MappingProxyType
+
+import word_journal
+import word_shards
+from negative_cache import BloomIndex
+from word_index import WordIndex, LayeredWordIndex, MappedWordIndex, SQLiteWordIndex, write_word_table
+from word_shards import ShardedWordIndex
+
+CACHE_FILE = word_journal.CACHE_FILE
+JOURNAL_FILE = word_journal.JOURNAL_FILE
+# Palavras de um só dígito (main.find_single_digit_words): a sua versão entra na tag do snapshot
+DIGIT_CACHE_FILE = 'digit_cache.json'
+# Índice binário gerado no deploy (build_word_index.py); usado quando não está desatualizado
+INDEX_FILE = os.environ.get('MENMONICA_WORD_INDEX', 'word_index.bin')
+# Backend "sqlite": consultas indexadas à tabela word_numbers (build_word_index.py --sqlite)
+BACKEND = os.environ.get('MENMONICA_WORD_BACKEND', 'files').lower()
+WORD_DB = os.environ.get('MENMONICA_WORD_DB', 'dictionary.db')
+# Backend "shards": um ficheiro por par, carregado só quando é consultado (build_word_index.py --shards)
+SHARD_DIR = word_shards.SHARD_DIR
+# Tentativas por palavra ao tirar palavras de frases ao acaso dos shards (compostas são rejeitadas)
+PHRASE_SAMPLE_ATTEMPTS = 20
+# Intervalo (segundos) do watcher que deteta alterações em disco; 0 desativa. Só arranca
+# nos processos que o pedem com watch() (a app web); scripts e CLI verificam os mtimes a cada leitura
+WATCH_INTERVAL = float(os.environ.get('MENMONICA_WATCH_INTERVAL', '2'))
+
+
+class WordSnapshot:
+    """
+    Imagem imutável dos dados de palavras: os pares de two_digit_cache.json
+    (mapeamento só de leitura par -> tuplo de entradas) e o índice correspondente.
+    Os endpoints leem sempre um snapshot completo; alterações publicam um novo.
+
+    Um snapshot pode também ser criado só a partir de um índice (p.ex. MappedWordIndex):
+    nesse caso os pares são derivados do índice apenas se alguém os pedir.
+    """
+
+    __slots__ = ('index', 'version', 'digit_version', 'tag', '_pairs_tag', '_pairs', '_phrase_pool',
+                 '_bucket_words', '_lookup_index')
+
+    def __init__(self, cache=None, version=0, index=None, digit_version=None):
+        pairs = None
+        if index is None:
+            pairs = {}
+            if isinstance(cache, dict):
+                for pair, entries in cache.items():
+                    if isinstance(entries, (list, tuple)):
+                        pairs[pair] = tuple(entries)
+            index = WordIndex.from_cache(pairs)
+            pairs = MappingProxyType(pairs)
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'digit_version', digit_version)
+        # Identifica o conteúdo (ETags, caches de resultados): muda também com extended()
+        # e com digit_cache.json (with_digit_version)
+        object.__setattr__(self, '_pairs_tag', f'{version:x}')
+        object.__setattr__(self, 'tag', _tag(self._pairs_tag, digit_version))
+        object.__setattr__(self, '_pairs', pairs)
+        object.__setattr__(self, '_phrase_pool', None)
+        object.__setattr__(self, '_bucket_words', {})
+        object.__setattr__(self, '_lookup_index', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('WordSnapshot é só de leitura')
+
+    @property
+    def available(self):
+        """True se havia dados de palavras para carregar."""
+        return self.index.pair_count > 0
+
+    @property
+    def pairs(self):
+        pairs = self._pairs
+        if pairs is None:
+            grouped = {}
+            for word, number in self.index.iter_entries():
+                grouped.setdefault(number[:2], []).append({'word': word, 'number': number})
+            pairs = MappingProxyType({p: tuple(es) for p, es in grouped.items()})
+            object.__setattr__(self, '_pairs', pairs)
+        return pairs
+
+    @property
+    def phrase_pool(self):
+        """
+        Palavras elegíveis para frases de prática (tuplo, calculado uma vez por snapshot).
+        Como o snapshot muda sempre que os dados mudam, o pool é refeito só nessa altura.
+        """
+        pool = self._phrase_pool
+        if pool is None:
+            pool = build_phrase_pool(self.index.iter_entries())
+            object.__setattr__(self, '_phrase_pool', pool)
+        return pool
+
+    def phrase_words(self, count):
+        """
+        Até `count` palavras distintas ao acaso para frases de prática. No backend shards são
+        tiradas dos shards a cada pedido (random_entries), sem manter o corpus inteiro em memória;
+        nos restantes, do phrase_pool.
+        """
+        random_entries = getattr(self.index, 'random_entries', None)
+        if random_entries is None:
+            pool = self.phrase_pool
+            return list(pool) if len(pool) <= count else random.sample(pool, count)
+        words = {}
+        for w, num in random_entries(count * PHRASE_SAMPLE_ATTEMPTS):
+            if is_phrase_word(w, num):
+                words.setdefault(w.strip().lower(), w)
+                if len(words) == count:
+                    break
+        return list(words.values())
+
+    def warm(self):
+        """Calcula já (fora dos pedidos) o pool de frases, se o backend o usar, e o índice de consulta."""
+        if not hasattr(self.index, 'random_entries'):
+            self.phrase_pool
+        self.lookup_index
+        return self
+
+    @property
+    def lookup_index(self):
+        """
+        Índice para as consultas da segmentação. Os índices em disco (mmap, SQLite)
+        ficam atrás de um filtro de Bloom, que exclui em O(1) os números sem palavras;
+        o WordIndex já responde em O(1) a partir do dicionário e é usado tal como está,
+        tal como os shards (o filtro obrigaria a ler todos a cada snapshot).
+        """
+        lookup = self._lookup_index
+        if lookup is None:
+            lookup = self.index if isinstance(self.index, (WordIndex, ShardedWordIndex)) else BloomIndex(self.index)
+            object.__setattr__(self, '_lookup_index', lookup)
+        return lookup
+
+    def bucket_words(self, pair):
+        """Conjunto (calculado uma vez por par) das palavras já guardadas no par."""
+        words = self._bucket_words.get(pair)
+        if words is None:
+            if self._pairs is None:
+                words = frozenset(self.index.pair_words(pair))
+            else:
+                words = frozenset(wd.get('word') for wd in self._pairs.get(pair, ()) if isinstance(wd, dict))
+            self._bucket_words[pair] = words
+        return words
+
+    def extended(self, pair, added, version):
+        """
+        Novo snapshot com as entradas `added` no par, reutilizando o trabalho deste:
+        o índice é estendido e o pool de frases é acrescentado, sem recalcular tudo.
+        """
+        pairs = None
+        if self._pairs is not None:
+            # Snapshots criados a partir de um índice continuam a derivar os pares só se forem pedidos
+            pairs = dict(self._pairs)
+            pairs[pair] = tuple(pairs.get(pair, ())) + tuple(added)
+            pairs = MappingProxyType(pairs)
+        snap = WordSnapshot.__new__(WordSnapshot)
+        object.__setattr__(snap, 'index', self.index.extended(pair, [wd['word'] for wd in added]))
+        object.__setattr__(snap, 'version', version)
+        object.__setattr__(snap, 'digit_version', self.digit_version)
+        # Derivada do conteúdo acrescentado: workers que acrescentam o mesmo obtêm a mesma tag
+        digest = zlib.crc32('\x1f'.join([pair] + [str(wd.get('word')) for wd in added]).encode('utf-8'),
+                            zlib.crc32(self._pairs_tag.encode('ascii')))
+        object.__setattr__(snap, '_pairs_tag', f'{version:x}.{digest:08x}')
+        object.__setattr__(snap, 'tag', _tag(snap._pairs_tag, self.digit_version))
+        object.__setattr__(snap, '_pairs', pairs)
+        pool = self._phrase_pool
+        if pool is not None:
+            seen = {w.strip().lower() for w in pool}
+            new_words = build_phrase_pool((wd.get('word'), wd.get('number')) for wd in added)
+            pool = pool + tuple(w for w in new_words if w.strip().lower() not in seen)
+        object.__setattr__(snap, '_phrase_pool', pool)
+        object.__setattr__(snap, '_bucket_words', {})
+        lookup = self._lookup_index
+        if isinstance(lookup, BloomIndex):
+            # O filtro é copiado com os números novos, sem percorrer o índice todo outra vez
+            lookup = lookup.extended(snap.index, [wd.get('word') for wd in added])
+        else:
+            lookup = None
+        object.__setattr__(snap, '_lookup_index', lookup)
+        return snap
+
+    def with_digit_version(self, digit_version):
+        """O mesmo snapshot (índice, pares e pool partilhados) com outra versão de digit_cache.json."""
+        snap = WordSnapshot.__new__(WordSnapshot)
+        for name in WordSnapshot.__slots__:
+            object.__setattr__(snap, name, getattr(self, name))
+        object.__setattr__(snap, 'digit_version', digit_version)
+        object.__setattr__(snap, 'tag', _tag(self._pairs_tag, digit_version))
+        return snap
+
+
+def _tag(pairs_tag, digit_version):
+    # Sem digit_cache.json a tag é só a dos pares; com ele leva o seu mtime a seguir
+    return pairs_tag if digit_version is None else f'{pairs_tag}-{digit_version:x}'
+
+
+def is_phrase_word(w, num):
+    """Palavras simples servem para frases: excluir compostas, com traços ou apóstrofos."""
+    if not (isinstance(w, str) and isinstance(num, str) and w and num):
+        return False
+    return not ((' ' in w) or ('-' in w) or ("'" in w))
+
+
+def build_phrase_pool(entries):
+    """
+    Recolhe palavras únicas (por minúsculas) a partir de pares (palavra, número),
+    excluindo compostas, com traços ou apóstrofos.
+    """
+    unique = {}
+    for w, num in entries:
+        if is_phrase_word(w, num):
+            lw = w.strip().lower()
+            # manter única por minúsculas
+            if lw not in unique:
+                unique[lw] = w
+    return tuple(unique.values())
+
+
+_snapshot = None
+_preloaded = False
+_lock = threading.Lock()
+
+
+def _file_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _json_version():
+    versions = [v for v in (_file_version(CACHE_FILE), _file_version(JOURNAL_FILE)) if v is not None]
+    return max(versions) if versions else None
+
+
+def _current_version():
+    """
+    Versão dos dados em disco: o mtime mais recente entre o JSON, o seu journal e o
+    índice binário. No backend sqlite é o mtime da base de dados; no backend shards, o do manifesto.
+    """
+    if BACKEND == 'sqlite':
+        return _file_version(WORD_DB) or 0
+    if BACKEND == 'shards':
+        return _file_version(os.path.join(SHARD_DIR, word_shards.MANIFEST_FILE)) or 0
+    versions = [v for v in (_json_version(), _file_version(INDEX_FILE)) if v is not None]
+    return max(versions) if versions else 0
+
+
+def load_snapshot():
+    """
+    Constrói um snapshot novo a partir do disco: a tabela indexada no backend sqlite,
+    os shards no backend shards, o índice binário em mmap quando existe (com as entradas
+    do JSON/journal posteriores ao build numa camada por cima), senão o JSON (vazio se
+    não existir/for inválido).
+    """
+    version = _current_version()
+    digit_version = _file_version(DIGIT_CACHE_FILE)
+    if BACKEND == 'sqlite':
+        try:
+            return WordSnapshot(version=version, index=SQLiteWordIndex(WORD_DB), digit_version=digit_version)
+        except sqlite3.Error as e:
+            print(f"Backend sqlite indisponível ({WORD_DB}): {e}")
+    if BACKEND == 'shards':
+        try:
+            return WordSnapshot(version=version, index=ShardedWordIndex(SHARD_DIR), digit_version=digit_version)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Backend shards indisponível ({SHARD_DIR}): {e}")
+    index_version = _file_version(INDEX_FILE)
+    if index_version is not None:
+        try:
+            base = MappedWordIndex(INDEX_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Índice binário ignorado ({INDEX_FILE}): {e}")
+        else:
+            json_version = _json_version()
+            if json_version is None or json_version <= index_version:
+                return WordSnapshot(version=version, index=base, digit_version=digit_version)
+            # O índice pode ter palavras de dictionary.db que o JSON não tem: nunca o trocar pelo JSON
+            index = LayeredWordIndex.over(base, word_journal.load_cache(CACHE_FILE, JOURNAL_FILE))
+            return WordSnapshot(version=version, index=index, digit_version=digit_version)
+    if _file_version(CACHE_FILE) is None and _file_version(JOURNAL_FILE) is None:
+        return WordSnapshot({}, 0, digit_version=digit_version)
+    return WordSnapshot(word_journal.load_cache(CACHE_FILE, JOURNAL_FILE), version, digit_version=digit_version)
+
+
+def get_snapshot():
+    """
+    Devolve o snapshot atual. Com o watcher ativo a leitura é só uma referência, sem
+    lock nem acesso ao disco. Sem watcher (MENMONICA_WATCH_INTERVAL=0, ou um processo
+    que não chamou watch()) os dados são recarregados aqui quando o seu mtime muda
+    (ou nunca, depois de preload()).
+    """
+    global _snapshot
+    snap = _snapshot
+    if snap is not None and _watcher is not None:
+        return snap
+    if _watch_requested and WATCH_INTERVAL > 0 and not _watcher_deferred:
+        start_watcher()
+        return _snapshot
+    if _preloaded and snap is not None:
+        return snap
+    version = _current_version()
+    if snap is None or snap.version != version:
+        with _lock:
+            snap = _snapshot
+            if snap is None or snap.version != version:
+                snap = load_snapshot()
+                _snapshot = snap
+    if snap.digit_version != _file_version(DIGIT_CACHE_FILE):
+        snap = refresh_digits()
+    return snap
+
+
+def current():
+    """
+    O snapshot atual sem carregar nada (None se ainda não houver), e se o watcher
+    deste processo está ativo. Para relatórios de estado, como /api/ready.
+    """
+    return _snapshot, _watcher is not None
+
+
+def refresh():
+    """
+    Reconstrói o snapshot se os dados em disco mudaram e troca-o atomicamente
+    (uma única atribuição). A construção é feita sem o lock; entradas publicadas
+    entretanto neste processo são reaplicadas ao snapshot novo antes da troca.
+    """
+    global _snapshot
+    current = refresh_digits()
+    if current is not None and current.version == _current_version():
+        return current
+    started = time.perf_counter()
+    with _lock:
+        _published.clear()
+    snap = load_snapshot().warm()  # calcular fora dos pedidos
+    with _lock:
+        for pair, added in _published:
+            if not isinstance(snap.index, (WordIndex, LayeredWordIndex)):
+                break
+            known = snap.bucket_words(pair)
+            fresh = [wd for wd in added if wd.get('word') not in known]
+            if fresh:
+                snap = snap.extended(pair, fresh, snap.version)
+        _published.clear()
+        _snapshot = snap
+    print(f"Snapshot de palavras atualizado ({snap.index.word_count} palavras) "
+          f"em {time.perf_counter() - started:.2f}s")
+    return snap
+
+
+def refresh_digits():
+    """
+    Se digit_cache.json mudou, troca o snapshot atual por uma cópia com a versão nova
+    (só a tag muda; índice e pares são partilhados). Chamado pelo refresh() e depois de
+    main.find_single_digit_words reescrever o ficheiro.
+    """
+    global _snapshot
+    digit_version = _file_version(DIGIT_CACHE_FILE)
+    snap = _snapshot
+    if snap is None or snap.digit_version == digit_version:
+        return snap
+    with _lock:
+        snap = _snapshot
+        if snap.digit_version != digit_version:
+            snap = _snapshot = snap.with_digit_version(digit_version)
+    return snap
+
+
+class SnapshotWatcher(threading.Thread):
+    """Thread que verifica a cada `interval` segundos se os dados mudaram (refresh())."""
+
+    def __init__(self, interval):
+        super().__init__(name='word-snapshot-watcher', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                refresh()
+            except Exception as e:
+                print(f"Erro ao atualizar o snapshot de palavras: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+_watcher = None
+# Pedido por watch() (a app web); herdado pelos workers criados por fork
+_watch_requested = False
+# Durante o aquecimento o watcher não arranca: no master do gunicorn (--preload) a thread
+# não sobreviveria ao fork; cada worker arranca o seu no primeiro get_snapshot() depois
+_watcher_deferred = False
+# Entradas publicadas desde o início do refresh() em curso (só com o watcher ativo)
+_published = []
+
+
+def start_watcher(interval=None):
+    """
+    Garante o snapshot inicial e arranca o watcher deste processo (uma vez; depois
+    de um fork o filho arranca o seu no primeiro get_snapshot()).
+    """
+    global _snapshot, _watcher
+    with _lock:
+        if _watcher is not None:
+            return _watcher
+        if _snapshot is None:
+            _snapshot = load_snapshot()
+        _watcher = SnapshotWatcher(interval or WATCH_INTERVAL)
+        _watcher.start()
+    return _watcher
+
+
+def watch():
+    """
+    Pede o watcher neste processo: arranca no próximo get_snapshot() fora do aquecimento
+    (com --preload, já em cada worker). Só a app web o chama.
+    """
+    global _watch_requested
+    _watch_requested = True
+
+
+@contextmanager
+def watcher_deferred():
+    """Dentro deste bloco get_snapshot() não arranca o watcher (ver warmup.run)."""
+    global _watcher_deferred
+    _watcher_deferred = True
+    try:
+        yield
+    finally:
+        _watcher_deferred = False
+
+
+def stop_watcher():
+    global _watcher
+    with _lock:
+        watcher, _watcher = _watcher, None
+    if watcher is not None:
+        watcher.stop()
+        watcher.join()
+
+
+def _reset_after_fork():
+    # As threads não sobrevivem ao fork: o worker arranca o seu próprio watcher
+    global _watcher, _lock, _watcher_deferred
+    _watcher = None
+    _lock = threading.Lock()
+    _watcher_deferred = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def preload():
+    """
+    Constrói o snapshot uma única vez no arranque (gunicorn --preload) para que os
+    workers criados por fork o partilhem em copy-on-write.
+    """
+    global _snapshot, _preloaded
+    with _lock:
+        _snapshot = load_snapshot().warm()  # calcular já, para também ser partilhado pelos workers
+        _preloaded = True
+    # Evitar que o GC toque nos objetos herdados e force cópias das páginas nos workers
+    gc.freeze()
+    return _snapshot
+
+
+def publish(pair, added):
+    """
+    Publica um snapshot que inclui as entradas `added` do par (já escritas no journal).
+    Snapshots em memória são estendidos; os restantes backends são recarregados.
+    """
+    global _snapshot
+    with _lock:
+        current = _snapshot
+        if BACKEND == 'sqlite' and current is not None and isinstance(current.index, SQLiteWordIndex):
+            # As palavras novas vão também para a tabela indexada, que continua a ser a fonte de leitura
+            write_word_table(WORD_DB, ((wd.get('word'), wd.get('number')) for wd in added))
+            snap = load_snapshot()
+        elif BACKEND == 'shards' and current is not None and isinstance(current.index, ShardedWordIndex):
+            # Só o shard do par e o manifesto são reescritos; os outros shards carregados continuam válidos
+            word_shards.add_words(SHARD_DIR, pair, [wd.get('word') for wd in added])
+            snap = load_snapshot()
+        elif current is not None and isinstance(current.index, (WordIndex, LayeredWordIndex)):
+            # Mantém a versão anterior: sem preload, o próximo get_snapshot() volta a ler
+            # o disco e apanha também escritas feitas por outros processos
+            snap = current.extended(pair, added, current.version)
+        else:
+            snap = load_snapshot()
+        _snapshot = snap
+        if _watcher is not None:
+            _published.append((pair, added))
+    return snap